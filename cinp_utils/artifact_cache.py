@@ -0,0 +1,180 @@
+"""
+Whole rendered outputs cached in a directory, which can be local or shared
+between build machines, ie: on NFS.  The output of each language is a
+.tar.gz keyed by the hash of the spec, the language, the service name, the
+source of the generator (the module_hash of the language's backend, which
+has its templates, and the generator_hash of the shared code), along with
+the rest of the header that is rendered in to the output, the url,
+root_path and timestamp.  The timestamp has to be the same for a hit, see
+codegen.get_timestamp, "none", or "now" with $SOURCE_DATE_EPOCH set, give
+the same one on every machine.
+
+A hit is restored without rendering, see codegen.render.
+"""
+import os
+import json
+import shutil
+import hashlib
+import logging
+import tarfile
+import tempfile
+import threading
+
+from cinp_utils.records import as_dict
+from cinp_utils.source_hash import generator_hash, module_hash, backend_filename
+from cinp_utils.sync import sync_dir
+
+DEFAULT_CACHE_SIZE = 1024  # MB
+ARTIFACT_SUFFIX = '.tar.gz'
+
+
+def spec_hash( root ):
+  """
+  Returns the hash of the tree from root, the same tree has the same hash
+  however it was crawled or loaded.
+  """
+  return hashlib.sha256( json.dumps( root, separators=( ',', ':' ), default=as_dict, skipkeys=True ).encode( 'utf-8' ) ).hexdigest()
+
+
+def _safe_member( member ):
+  return ( member.isfile() or member.isdir() ) and not os.path.isabs( member.name ) and '..' not in member.name.split( '/' )
+
+
+class ArtifactCache():
+  """
+  Outputs in cache_dir, a .tar.gz per key.  Restoring an output touches its
+  file, so the mtimes order the outputs by when they were last used, evict
+  removes the least recently used until the cache is no larger than
+  max_size bytes.  Outputs are written to a temp file and moved in to place,
+  so other processes and machines never see a partial one.  The counts of
+  hits, misses, outputs stored and evicted are kept for stats.
+  """
+  def __init__( self, cache_dir, max_size=DEFAULT_CACHE_SIZE * 1024 * 1024 ):
+    super().__init__()
+    self.cache_dir = cache_dir
+    self.max_size = max_size
+    self.lock = threading.Lock()
+    self.hit_count = 0
+    self.miss_count = 0
+    self.store_count = 0
+    self.evict_count = 0
+
+  def key( self, root_hash, language, header_map ):
+    """
+    Returns the key of the output of language for the tree with spec_hash
+    root_hash, rendered with header_map, see codegen.get_header_map.
+    """
+    value = [ generator_hash(), module_hash( backend_filename( language ) ), root_hash, language, header_map[ 'service' ], header_map[ 'url' ], header_map[ 'root_path' ], header_map[ 'timestamp' ] ]
+    return hashlib.sha256( json.dumps( value, separators=( ',', ':' ) ).encode( 'utf-8' ) ).hexdigest()
+
+  def _filename( self, key ):
+    return os.path.join( self.cache_dir, '{0}{1}'.format( key, ARTIFACT_SUFFIX ) )
+
+  def restore( self, key, wrk_dir ):
+    """
+    Sync the output cached for key in to wrk_dir, see sync.sync_dir, returns
+    True if it was cached.
+    """
+    filename = self._filename( key )
+    stage_dir = tempfile.mkdtemp( prefix='cinp-codegen-' )
+    try:
+      try:
+        with tarfile.open( filename, 'r:gz' ) as tar:
+          tar.extractall( stage_dir, members=[ member for member in tar.getmembers() if _safe_member( member ) ] )
+
+      except FileNotFoundError:
+        with self.lock:
+          self.miss_count += 1
+
+        return False
+
+      except ( OSError, EOFError, tarfile.TarError ) as e:  # store replaces it
+        logging.warning( 'Ignoring unreadable artifact "{0}": {1}'.format( filename, e ) )
+        with self.lock:
+          self.miss_count += 1
+
+        return False
+
+      try:
+        os.utime( filename )
+      except FileNotFoundError:  # evicted by another process since it was read
+        pass
+
+      sync_dir( stage_dir, wrk_dir )
+
+    finally:
+      shutil.rmtree( stage_dir, ignore_errors=True )
+
+    logging.debug( 'Restored "{0}" from artifact "{1}"'.format( wrk_dir, filename ) )
+    with self.lock:
+      self.hit_count += 1
+
+    return True
+
+  def store( self, key, src_dir ):
+    """
+    Cache the output in src_dir for key.
+    """
+    os.makedirs( self.cache_dir, exist_ok=True )
+    filename = self._filename( key )
+    tmp_filename = '{0}.{1}.tmp'.format( filename, os.getpid() )
+    try:
+      with tarfile.open( tmp_filename, 'w:gz' ) as tar:
+        for name in sorted( os.listdir( src_dir ) ):
+          tar.add( os.path.join( src_dir, name ), arcname=name )
+
+      os.replace( tmp_filename, filename )
+
+    except BaseException:
+      try:
+        os.unlink( tmp_filename )
+      except FileNotFoundError:
+        pass
+
+      raise
+
+    with self.lock:
+      self.store_count += 1
+
+  def evict( self ):
+    """
+    Remove the least recently used outputs until the cache is no larger than
+    max_size bytes, returns the number of outputs removed.
+    """
+    entry_list = []
+    total = 0
+    try:
+      scan_list = [ entry for entry in os.scandir( self.cache_dir ) if entry.name.endswith( ARTIFACT_SUFFIX ) ]
+    except FileNotFoundError:
+      return 0
+
+    for entry in scan_list:
+      try:
+        stat = entry.stat()
+      except FileNotFoundError:  # evicted by another process
+        continue
+
+      entry_list.append( ( stat.st_mtime, stat.st_size, entry.path ) )
+      total += stat.st_size
+
+    count = 0
+    for _, size, filename in sorted( entry_list ):
+      if total <= self.max_size:
+        break
+
+      try:
+        os.unlink( filename )
+      except FileNotFoundError:
+        pass
+
+      total -= size
+      count += 1
+
+    with self.lock:
+      self.evict_count += count
+
+    return count
+
+  def stats( self ):
+    with self.lock:
+      return { 'max_size': self.max_size, 'hits': self.hit_count, 'misses': self.miss_count, 'stored': self.store_count, 'evicted': self.evict_count }
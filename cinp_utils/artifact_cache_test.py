@@ -0,0 +1,58 @@
+import os
+
+from cinp_utils import artifact_cache
+from cinp_utils.artifact_cache import ArtifactCache, spec_hash
+from cinp_utils.codegen import crawl, render, get_header_map
+
+
+def test_key( cinp_server, tmp_path, monkeypatch ):
+  spec = crawl( cinp_server.endpoint )
+  cache = ArtifactCache( str( tmp_path ) )
+  root_hash = spec_hash( spec[ 'root' ] )
+  header_map = get_header_map( spec, 'test', 'none' )
+
+  key = cache.key( root_hash, 'go', header_map )
+  assert key == cache.key( spec_hash( crawl( cinp_server.endpoint )[ 'root' ] ), 'go', header_map )
+  assert key != cache.key( root_hash, 'ts', header_map )
+  assert key != cache.key( root_hash, 'go', get_header_map( spec, 'other', 'none' ) )
+
+  monkeypatch.setattr( artifact_cache, 'module_hash', lambda filename: 'changed' if filename.endswith( 'codegen_go.py' ) else 'same' )
+  assert key != cache.key( root_hash, 'go', header_map )  # the go backend changed
+
+  backend_key = cache.key( root_hash, 'go', header_map )
+  monkeypatch.setattr( artifact_cache, 'generator_hash', lambda: 'changed' )
+  assert backend_key != cache.key( root_hash, 'go', header_map )  # the shared code changed
+
+
+def test_render( cinp_server, tmp_path, read_output ):
+  spec = crawl( cinp_server.endpoint )
+  plain_dir = str( tmp_path / 'plain' )
+  render( spec, 'go', plain_dir, 'test', timestamp='none' )
+
+  cache = ArtifactCache( str( tmp_path / 'cache' ) )
+  render( spec, 'go', str( tmp_path / 'miss' ), 'test', timestamp='none', artifact_cache=cache )
+  assert cache.stats()[ 'misses' ] == 1 and cache.stats()[ 'stored' ] == 1
+  assert read_output( str( tmp_path / 'miss' ) ) == read_output( plain_dir )
+
+  render( spec, 'go', str( tmp_path / 'hit' ), 'test', timestamp='none', artifact_cache=cache )
+  assert cache.stats()[ 'hits' ] == 1
+  assert read_output( str( tmp_path / 'hit' ) ) == read_output( plain_dir )
+
+  cinp_server.tree[ '/api/v1/Item' ][1][ 'doc' ] = 'Item doc v2'
+  spec = crawl( cinp_server.endpoint )
+  render( spec, 'go', plain_dir, 'test', timestamp='none' )
+  render( spec, 'go', str( tmp_path / 'hit' ), 'test', timestamp='none', artifact_cache=cache )
+  assert cache.stats()[ 'misses' ] == 2  # a changed spec is not a hit
+  assert read_output( str( tmp_path / 'hit' ) ) == read_output( plain_dir )
+
+
+def test_evict( tmp_path ):
+  cache = ArtifactCache( str( tmp_path / 'cache' ), max_size=0 )
+  src_dir = tmp_path / 'src'
+  src_dir.mkdir()
+  ( src_dir / 'file' ).write_text( 'content' )
+
+  cache.store( 'a', str( src_dir ) )
+  assert os.listdir( str( tmp_path / 'cache' ) ) == [ 'a.tar.gz' ]
+  assert cache.evict() == 1
+  assert not cache.restore( 'a', str( tmp_path / 'out' ) )
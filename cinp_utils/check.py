@@ -0,0 +1,44 @@
+import os
+import re
+
+HEAD_SIZE = 16384  # the url and api version are in the first few lines of the file
+
+URL_PATTERN = r'Automatically generated by cinp-codegen from (\S+)\s'  # the timestamp can be left out, see codegen.get_header_map
+
+# language: ( filename, url regex, api version regex ), filename is formatted with the service name
+# the language modules are not imported, so checking does not pay for loading jinja and compiling the templates
+LANGUAGE_MAP = {
+                 'rst': ( 'api.rst', URL_PATTERN, r'for api version \*(.*)\*' ),
+                 'python': ( '{0}.py', URL_PATTERN, r"if ns\[ 'api-version' \] != '(.*)':" ),
+                 'go': ( 'service.go', URL_PATTERN, r'if APIVersion != "(.*)" {' ),
+                 'ts': ( '{0}.ts', URL_PATTERN, r"res\.version === '(.*)' \);" ),
+                 'rust': ( '{0}.rs', URL_PATTERN, r'// Namespace \S* at \S+ version (\S+)' )  # the first namespace is the root
+               }
+
+
+def read_header( wrk_dir, language, service ):
+  """
+  Returns the ( url, api version ) the existing output for language in wrk_dir
+  was generated from, None if there is no output or it can not be parsed.
+  """
+  filename, url_pattern, version_pattern = LANGUAGE_MAP[ language ]
+  try:
+    with open( os.path.join( wrk_dir, filename.format( service ) ), 'r' ) as fp:
+      head = fp.read( HEAD_SIZE )
+  except OSError:
+    return None
+
+  url_match = re.search( url_pattern, head )
+  version_match = re.search( version_pattern, head )
+  if url_match is None or version_match is None:
+    return None
+
+  return url_match.group( 1 ), version_match.group( 1 )
+
+
+def is_current( wrk_dir, language, service, url, api_version ):
+  """
+  Returns True if the existing output for language in wrk_dir was generated
+  from url at api_version.
+  """
+  return read_header( wrk_dir, language, service ) == ( url, api_version )
@@ -0,0 +1,57 @@
+import os
+import sys
+import subprocess
+
+from cinp_utils.check import read_header, is_current
+from cinp_utils.codegen import crawl, render
+
+REPO_DIR = os.path.dirname( os.path.dirname( os.path.abspath( __file__ ) ) )
+
+
+def _check( endpoint, wrk_dir, *language_list ):
+  env = dict( os.environ, PYTHONPATH=os.pathsep.join( [ REPO_DIR ] + sys.path ) )
+  command = [ sys.executable, os.path.join( REPO_DIR, 'cinp-codegen' ), '--check', '-s', 'test', '-d', wrk_dir ]
+  for language in language_list:
+    command += [ '-l', language ]
+
+  return subprocess.run( command + [ endpoint ], env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE ).returncode
+
+
+def test_read_header( cinp_server, tmp_path ):
+  spec = crawl( cinp_server.endpoint )
+  language_dir_map = render( spec, [ 'rst', 'python', 'go', 'ts', 'rust' ], str( tmp_path ), 'test' )
+  for language, wrk_dir in language_dir_map.items():
+    assert read_header( wrk_dir, language, 'test' ) == ( cinp_server.endpoint, '1.0' )
+
+  render( spec, 'go', str( tmp_path / 'none' ), 'test', timestamp='none' )
+  assert is_current( str( tmp_path / 'none' ), 'go', 'test', cinp_server.endpoint, '1.0' )
+  assert not is_current( str( tmp_path / 'none' ), 'go', 'test', cinp_server.endpoint, '2.0' )
+  assert read_header( str( tmp_path / 'missing' ), 'go', 'test' ) is None
+
+
+def test_exit_code( cinp_server, tmp_path ):
+  wrk_dir = str( tmp_path )
+  assert _check( cinp_server.endpoint, wrk_dir, 'go' ) == 2  # nothing generated yet
+
+  render( crawl( cinp_server.endpoint ), [ 'go', 'rst' ], wrk_dir, 'test' )
+  assert _check( cinp_server.endpoint, wrk_dir, 'go', 'rst' ) == 0
+  assert _check( cinp_server.endpoint, wrk_dir, 'go', 'ts' ) == 2  # ts is not generated
+  describe_count = len( cinp_server.describe_list )
+
+  cinp_server.set_api_version( '2.0' )
+  assert _check( cinp_server.endpoint, wrk_dir, 'go', 'rst' ) == 2
+  assert len( cinp_server.describe_list ) == describe_count + 1  # only the root is described
+
+  cinp_server.fail_map[ '/api/v1/' ] = 1
+  assert _check( cinp_server.endpoint, wrk_dir, 'go', 'rst' ) == 1
+  assert _check( cinp_server.endpoint.replace( '/api/v1/', '/api/v2/' ), wrk_dir, 'go', 'rst' ) == 1
+
+
+def test_no_render_imports():
+  """
+  --check does not load jinja2 or the renderers, nor does anything
+  cinp-codegen imports before it runs.
+  """
+  code = 'import sys, cinp_utils.codegen, cinp_utils.server, cinp_utils.fragment_cache, cinp_utils.artifact_cache; print( sorted( name for name in sys.modules if name.startswith( ( "jinja2", "cinp_utils.codegen_" ) ) ) )'
+  env = dict( os.environ, PYTHONPATH=os.pathsep.join( [ REPO_DIR ] + sys.path ) )
+  assert subprocess.run( [ sys.executable, '-c', code ], env=env, stdout=subprocess.PIPE, check=True ).stdout.strip() == b'[]'
@@ -0,0 +1,489 @@
+"""
+Crawl CInP APIs and render them, the library behind cinp-codegen.
+
+  from cinp_utils.codegen import crawl, render
+
+  if __name__ == '__main__':
+    spec = crawl( 'http://service/api/v1/' )
+    render( spec, [ 'go', 'ts' ], 'gen', 'service' )
+
+Errors are raised, nothing here exits or configures logging, so one process
+can generate any number of clients.
+
+The process pools (more than one language, render_jobs, generate_manifest)
+are started with spawn, which imports the calling script's __main__ in each
+process, so a script calling them must do so under an
+"if __name__ == '__main__':" guard, as above, or multiprocessing raises a
+RuntimeError.  Pass an executor to render/generate to use your own pool.
+"""
+import os
+import time
+import shutil
+import logging
+import tempfile
+import urllib.parse
+import multiprocessing
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from cinp import client
+
+from cinp_utils.crawler import Crawler
+from cinp_utils.describe_cache import DescribeCache
+from cinp_utils.spec import build_tree
+from cinp_utils.ir import ensure_ir
+from cinp_utils.governor import Governor
+from cinp_utils.transport import DescribeTransport
+from cinp_utils.path_filter import PathFilter
+from cinp_utils.check import is_current
+from cinp_utils.sync import sync_dir
+from cinp_utils.fragment_cache import get_fragment_cache
+from cinp_utils.incremental import remove_state
+from cinp_utils.artifact_cache import spec_hash
+
+LANGUAGE_LIST = [ 'rst', 'python', 'go', 'ts', 'rust' ]
+TIMESTAMP_LIST = [ 'now', 'spec', 'none' ]
+
+
+def get_render_funcs( language ):
+  """
+  Returns ( render func, stream render func ) for language, the stream render
+  func is None for languages that need the whole tree.
+  """
+  if language == 'rst':
+    from cinp_utils.codegen_rst import rst_render_func, rst_stream_render_func
+    return rst_render_func, rst_stream_render_func
+
+  elif language == 'python':
+    from cinp_utils.codegen_python import python_render_func, python_stream_render_func
+    return python_render_func, python_stream_render_func
+
+  elif language == 'go':
+    from cinp_utils.codegen_go import go_render_func, go_stream_render_func
+    return go_render_func, go_stream_render_func
+
+  elif language == 'ts':
+    from cinp_utils.codegen_ts import ts_render_func
+    return ts_render_func, None  # needs the whole tree to resolve model references
+
+  elif language == 'rust':
+    from cinp_utils.codegen_rust import rust_render_func
+    return rust_render_func, None  # needs the whole tree to resolve model references
+
+  raise ValueError( 'Unknown Language Type "{0}"'.format( language ) )
+
+
+def get_language_dir_map( language, wrk_dir ):
+  """
+  Returns { language: directory } for language, a name, comma seperated names
+  or a list of them.  A single language is rendered into wrk_dir, more than
+  one each into a sub directory of wrk_dir named for the language.  Raises
+  ValueError for an unknown language.
+  """
+  if language is None:
+    language = [ 'rst' ]
+  elif isinstance( language, str ):
+    language = [ language ]
+
+  language_list = []
+  for value in language:
+    for name in value.split( ',' ):
+      name = name.strip()
+      if name not in LANGUAGE_LIST:
+        raise ValueError( 'Unknown Language Type "{0}"'.format( name ) )
+
+      if name not in language_list:
+        language_list.append( name )
+
+  if len( language_list ) == 1:
+    return { language_list[0]: wrk_dir }
+
+  return dict( [ ( name, os.path.join( wrk_dir, name ) ) for name in language_list ] )
+
+
+def get_host( url ):
+  return '{0}://{1}:{2}'.format( url.scheme, url.hostname, url.port if url.port is not None else 80 )
+
+
+def get_transport( endpoint, proxy=None, keep_alive=False ):
+  """
+  Returns the client to describe endpoint with, a DescribeTransport, or the
+  plain cinp client if keep_alive is False.
+  """
+  url = urllib.parse.urlparse( endpoint )
+  if keep_alive:
+    return DescribeTransport( get_host( url ), proxy )
+
+  return client.CInP( get_host( url ), url.path, proxy )
+
+
+def iter_crawl( endpoint, proxy=None, keep_alive=False, jobs=1, max_rate=None, retries=3, cache_dir=None, checkpoint=None, include=None, exclude=None, stats=None, cinp=None, governor=None ):
+  """
+  Start a crawl of the CInP API at endpoint, returns ( spec header,
+  namespace iterator ) the same as spec.iter_spec, the crawl runs as the
+  iterator is consumed.  See Crawler for jobs, retries and checkpoint, and
+  PathFilter for include and exclude.
+
+  cinp (see get_transport) and governor can be passed in to share them
+  between crawls of services on the same host.
+  """
+  url = urllib.parse.urlparse( endpoint )
+  if cinp is None:
+    cinp = get_transport( endpoint, proxy, keep_alive )
+
+  if governor is None:
+    governor = Governor( jobs, max_rate )
+
+  cache = None
+  if cache_dir:
+    cache = DescribeCache( cache_dir, endpoint )
+
+  path_filter = None
+  if include or exclude:
+    path_filter = PathFilter( url.path, include, exclude )
+
+  spec_header = { 'url': endpoint, 'root_path': url.path, 'timestamp': datetime.utcnow().isoformat() }
+  namespace_iter = Crawler( cinp, jobs, cache, stats, governor, retries, checkpoint, path_filter ).walk( url.path )
+  if path_filter is not None:
+    namespace_iter = path_filter.filter_iter( namespace_iter )
+
+  return spec_header, namespace_iter
+
+
+def crawl( endpoint, **kwargs ):
+  """
+  Crawl the CInP API at endpoint, returns the spec, the same as
+  spec.load_spec, takes the same arguments as iter_crawl.
+  """
+  spec_header, namespace_iter = iter_crawl( endpoint, **kwargs )
+  root = build_tree( namespace_iter )
+  if root is None:
+    raise ValueError( 'Unable to Describe root node' )
+
+  return dict( spec_header, root=root )
+
+
+def get_timestamp( spec_header, timestamp='now' ):
+  """
+  Returns the generated at timestamp to put in the output, timestamp is one
+  of TIMESTAMP_LIST:
+    now - the current time, or $SOURCE_DATE_EPOCH if it is set
+    spec - the time the spec was crawled, the same each time a saved spec is rendered
+    none - no timestamp, the output only changes when the API does
+  """
+  if timestamp == 'now':
+    source_date_epoch = os.environ.get( 'SOURCE_DATE_EPOCH', None )
+    if source_date_epoch:
+      try:
+        return datetime.utcfromtimestamp( int( source_date_epoch ) ).isoformat()
+      except ValueError:
+        raise ValueError( 'Invalid SOURCE_DATE_EPOCH "{0}"'.format( source_date_epoch ) )
+
+    return datetime.utcnow().isoformat()
+
+  elif timestamp == 'spec':
+    return spec_header[ 'timestamp' ]
+
+  elif timestamp == 'none':
+    return None
+
+  raise ValueError( 'Unknown Timestamp "{0}"'.format( timestamp ) )
+
+
+def get_header_map( spec_header, service, timestamp='now' ):
+  return { 'url': spec_header[ 'url' ], 'service': service, 'root_path': spec_header[ 'root_path' ], 'timestamp': get_timestamp( spec_header, timestamp ) }
+
+
+def _evict_fragments():
+  fragment_cache = get_fragment_cache()
+  if fragment_cache is not None:
+    fragment_cache.evict()
+
+
+def _render_jobs( language_dir_map, header_map, root, render_jobs, incremental=False ):
+  """
+  Render each language in turn, splitting the namespaces of each across a
+  process pool of render_jobs.
+  """
+  error = None
+  with ProcessPoolExecutor( max_workers=render_jobs, mp_context=multiprocessing.get_context( 'spawn' ) ) as executor:
+    for language, wrk_dir in language_dir_map.items():
+      try:
+        get_render_funcs( language )[0]( wrk_dir, header_map, root, executor, render_jobs, incremental )
+      except Exception as e:
+        logging.error( 'Error rendering "{0}": "{1}"'.format( language, e ) )
+        error = error or e
+
+  if error is not None:
+    raise error
+
+
+def _render( language_dir_map, header_map, root, executor, render_jobs=1, incremental=False ):
+  root = ensure_ir( root )  # once for all the languages
+
+  if executor is None and render_jobs > 1:
+    return _render_jobs( language_dir_map, header_map, root, render_jobs, incremental )
+
+  if executor is None:
+    if len( language_dir_map ) == 1:
+      for language, wrk_dir in language_dir_map.items():
+        get_render_funcs( language )[0]( wrk_dir, header_map, root, incremental=incremental )
+
+      return
+
+    with ProcessPoolExecutor( max_workers=len( language_dir_map ), mp_context=multiprocessing.get_context( 'spawn' ) ) as executor:
+      return _render( language_dir_map, header_map, root, executor, incremental=incremental )
+
+  future_map = {}
+  for language, wrk_dir in language_dir_map.items():
+    future_map[ language ] = executor.submit( get_render_funcs( language )[0], wrk_dir, header_map, root, incremental=incremental )
+
+  error = None
+  for language, future in future_map.items():
+    try:
+      future.result()
+    except Exception as e:
+      logging.error( 'Error rendering "{0}": "{1}"'.format( language, e ) )
+      error = error or e
+
+  if error is not None:
+    raise error
+
+
+def _render_cached( language_dir_map, header_map, root, executor, render_jobs, artifact_cache ):
+  """
+  Restore the output of the languages artifact_cache has, the rest are
+  rendered in to a staging directory, cached and synced in to their
+  directories, see sync.sync_dir.
+  """
+  root_hash = spec_hash( root )
+  key_map = dict( [ ( language, artifact_cache.key( root_hash, language, header_map ) ) for language in language_dir_map ] )
+  render_dir_map = dict( [ ( language, wrk_dir ) for language, wrk_dir in language_dir_map.items() if not artifact_cache.restore( key_map[ language ], wrk_dir ) ] )
+  if render_dir_map:
+    stage_dir = tempfile.mkdtemp( prefix='cinp-codegen-' )
+    try:
+      stage_dir_map = dict( [ ( language, os.path.join( stage_dir, language ) ) for language in render_dir_map ] )
+      for language_dir in stage_dir_map.values():
+        os.makedirs( language_dir )
+
+      _render( stage_dir_map, header_map, root, executor, render_jobs )
+
+      for language, language_dir in stage_dir_map.items():
+        artifact_cache.store( key_map[ language ], language_dir )
+        sync_dir( language_dir, render_dir_map[ language ] )
+
+    finally:
+      shutil.rmtree( stage_dir, ignore_errors=True )
+
+  artifact_cache.evict()
+
+
+def render( spec, language, wrk_dir, service, executor=None, render_jobs=1, timestamp='now', incremental=False, artifact_cache=None ):
+  """
+  Render spec in language (see get_language_dir_map) into wrk_dir, more than
+  one language are rendered in parallel in a process pool, or in executor if
+  it is passed in.  With render_jobs more than 1 the namespaces of each
+  language are rendered in parallel in a process pool of that size instead.
+  See get_timestamp for timestamp, files whose content is unchanged are not
+  written.  With incremental the spec is kept in each language's directory
+  and only what changed since the last incremental render is rendered, see
+  incremental.  Rendered models are cached if $CINP_CODEGEN_FRAGMENT_CACHE
+  is set, see fragment_cache.  With an artifact_cache (see artifact_cache)
+  the output of each language it has is restored instead of rendered, it
+  can not be used with incremental.  Returns { language: directory }.
+
+  The process pools are started with spawn, call this under an
+  "if __name__ == '__main__':" guard when they are used, see above.
+  """
+  if incremental and artifact_cache is not None:
+    raise ValueError( 'An artifact cache can not be used with incremental' )
+
+  language_dir_map = get_language_dir_map( language, wrk_dir )
+  for language_dir in language_dir_map.values():
+    os.makedirs( language_dir, exist_ok=True )
+    if not incremental:
+      remove_state( language_dir )
+
+  header_map = get_header_map( spec, service, timestamp )
+  if artifact_cache is None:
+    _render( language_dir_map, header_map, spec[ 'root' ], executor, render_jobs, incremental )
+  else:
+    _render_cached( language_dir_map, header_map, spec[ 'root' ], executor, render_jobs, artifact_cache )
+
+  _evict_fragments()
+
+  return language_dir_map
+
+
+def render_iter( spec_header, namespace_iter, language, wrk_dir, service, render_jobs=1, timestamp='now', incremental=False, artifact_cache=None ):
+  """
+  Render the ( spec header, namespace iterator ) from iter_crawl or
+  spec.iter_spec.  For a single language that can stream, without
+  render_jobs, incremental or artifact_cache, each Namespace is rendered as
+  soon as it comes from the iterator, otherwise the tree is built first.
+  Returns { language: directory }.
+  """
+  language_dir_map = get_language_dir_map( language, wrk_dir )
+  if len( language_dir_map ) == 1 and render_jobs < 2 and not incremental and artifact_cache is None:
+    language, language_dir = list( language_dir_map.items() )[0]
+    stream_render_func = get_render_funcs( language )[1]
+    if stream_render_func is not None:
+      os.makedirs( language_dir, exist_ok=True )
+      remove_state( language_dir )
+      stream_render_func( language_dir, get_header_map( spec_header, service, timestamp ), namespace_iter )
+      _evict_fragments()
+      return language_dir_map
+
+  root = build_tree( namespace_iter )
+  if root is None:
+    raise ValueError( 'Unable to Describe root node' )
+
+  return render( dict( spec_header, root=root ), language, wrk_dir, service, render_jobs=render_jobs, timestamp=timestamp, incremental=incremental, artifact_cache=artifact_cache )
+
+
+def check( endpoint, language, wrk_dir, service, proxy=None, keep_alive=False ):
+  """
+  Describe the root of endpoint and compare it with the output in wrk_dir,
+  returns ( api version, { directory: True if current } ).
+  """
+  url = urllib.parse.urlparse( endpoint )
+  language_dir_map = get_language_dir_map( language, wrk_dir )
+
+  item, type = get_transport( endpoint, proxy, keep_alive ).describe( url.path )
+  if type != 'Namespace':
+    raise ValueError( 'Expected Namespace got "{0}"'.format( type ) )
+
+  return item[ 'api-version' ], dict( [ ( language_dir, is_current( language_dir, name, service, endpoint, item[ 'api-version' ] ) ) for name, language_dir in language_dir_map.items() ] )
+
+
+def generate( endpoint, service, language, wrk_dir, executor=None, **kwargs ):
+  """
+  Crawl endpoint and render it, kwargs are passed to iter_crawl.  Errors are
+  logged and reported in the result, ie:
+
+    { 'service': service, 'endpoint': endpoint, 'dir': wrk_dir, 'success': True, 'crawl_time': 1.2, 'render_time': 0.3, 'error': None }
+
+  More than one language is rendered in a spawn process pool, unless
+  executor is passed in, call this under an "if __name__ == '__main__':"
+  guard, see render.
+  """
+  result = { 'service': service, 'endpoint': endpoint, 'dir': wrk_dir, 'success': False, 'crawl_time': 0.0, 'render_time': 0.0, 'error': None }
+  try:
+    start = time.perf_counter()
+    try:
+      spec = crawl( endpoint, **kwargs )
+    finally:
+      result[ 'crawl_time' ] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    render( spec, language, wrk_dir, service, executor )
+    result[ 'render_time' ] = time.perf_counter() - start
+    result[ 'success' ] = True
+
+  except Exception as e:
+    logging.error( 'Error generating "{0}" from "{1}": "{2}"'.format( service, endpoint, e ) )
+    result[ 'error' ] = str( e )
+
+  return result
+
+
+def generate_manifest( entry_list, manifest_jobs=4, jobs=1, max_rate=None, proxy=None, keep_alive=False, **kwargs ):
+  """
+  Generate every entry from manifest.load_manifest, manifest_jobs at a time,
+  the renders of all the services share one process pool.  Services on the
+  same host share a Governor, so jobs/max_rate limit the requests to each
+  host, and with keep_alive a DescribeTransport, so their connections are
+  reused.  kwargs are
+  passed to iter_crawl.  Returns the list of generate results.
+
+  The render process pool is always started, with spawn, call this under an
+  "if __name__ == '__main__':" guard, see render.
+  """
+  for entry in entry_list:
+    get_language_dir_map( entry[ 'language' ], entry[ 'dir' ] )  # fail before anything is crawled
+
+  host_map = {}
+  for entry in entry_list:
+    host = get_host( urllib.parse.urlparse( entry[ 'endpoint' ] ) )
+    if host not in host_map:
+      host_map[ host ] = ( get_transport( entry[ 'endpoint' ], proxy, True ) if keep_alive else None, Governor( jobs, max_rate ) )
+
+  def _generate( entry ):
+    cinp, governor = host_map[ get_host( urllib.parse.urlparse( entry[ 'endpoint' ] ) ) ]
+    return generate( entry[ 'endpoint' ], entry[ 'service' ], entry[ 'language' ], entry[ 'dir' ], render_executor,
+                     proxy=proxy, keep_alive=keep_alive, jobs=jobs, include=entry[ 'include' ], exclude=entry[ 'exclude' ], cinp=cinp, governor=governor, **kwargs )
+
+  try:
+    # the render processes are started while crawl threads are running, forking then can deadlock on locks held by those threads
+    with ProcessPoolExecutor( mp_context=multiprocessing.get_context( 'spawn' ) ) as render_executor, ThreadPoolExecutor( max_workers=manifest_jobs ) as executor:
+      return list( executor.map( _generate, entry_list ) )
+
+  finally:
+    for cinp, _ in host_map.values():
+      if cinp is not None:
+        cinp.close()
+
+
+def regenerate( endpoint, service, language, wrk_dir, **kwargs ):
+  """
+  Crawl endpoint and render it into a staging directory, then only write the
+  files in wrk_dir that changed, see sync.sync_dir.  kwargs are passed to
+  iter_crawl.  Returns ( written list, removed list ).
+  """
+  stage_dir = tempfile.mkdtemp( prefix='cinp-codegen-' )
+  try:
+    spec = crawl( endpoint, **kwargs )
+    render( spec, language, stage_dir, service )
+    return sync_dir( stage_dir, wrk_dir )
+
+  finally:
+    shutil.rmtree( stage_dir, ignore_errors=True )
+
+
+def watch( endpoint, service, language, wrk_dir, interval, proxy=None, keep_alive=False, cache_dir=None, **kwargs ):
+  """
+  Describe the root of endpoint every interval seconds, and regenerate (see
+  regenerate) when its api-version changes, or to start with if the output
+  in wrk_dir is not current.  The crawls use a describe cache, in cache_dir or
+  a temporary directory, so only Namespaces whose api-version changed are
+  crawled again.  Yields ( api version, written list, removed list ) for each
+  regeneration, errors are logged and tried again at the next interval.
+  kwargs are passed to iter_crawl.
+  """
+  url = urllib.parse.urlparse( endpoint )
+  language_dir_map = get_language_dir_map( language, wrk_dir )
+  cinp = get_transport( endpoint, proxy, keep_alive )
+
+  tmp_cache_dir = None
+  if cache_dir is None:
+    tmp_cache_dir = tempfile.mkdtemp( prefix='cinp-codegen-cache-' )
+    cache_dir = tmp_cache_dir
+
+  try:
+    last_version = None
+    while True:
+      try:
+        item, type = cinp.describe( url.path )
+        if type != 'Namespace':
+          raise ValueError( 'Expected Namespace got "{0}"'.format( type ) )
+
+        api_version = item[ 'api-version' ]
+        if api_version != last_version:
+          if last_version is None and all( [ is_current( language_dir, name, service, endpoint, api_version ) for name, language_dir in language_dir_map.items() ] ):
+            logging.info( 'Output in "{0}" is current with api version "{1}"'.format( wrk_dir, api_version ) )
+            written_list, removed_list = None, None
+          else:
+            written_list, removed_list = regenerate( endpoint, service, language, wrk_dir, proxy=proxy, keep_alive=keep_alive, cache_dir=cache_dir, cinp=cinp, **kwargs )
+
+          last_version = api_version
+          if written_list is not None:
+            yield api_version, written_list, removed_list
+
+      except Exception as e:
+        logging.error( 'Error watching "{0}": "{1}"'.format( endpoint, e ) )
+
+      time.sleep( interval )
+
+  finally:
+    if tmp_cache_dir is not None:
+      shutil.rmtree( tmp_cache_dir, ignore_errors=True )
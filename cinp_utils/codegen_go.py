@@ -1,6 +1,18 @@
 import os
 import re
-from jinja2 import Environment
+
+from cinp_utils.ir import ensure_ir, iter_ir, memoize
+from cinp_utils.spec import iter_tree
+from cinp_utils.templates import get_environment
+from cinp_utils.fragments import map_fragments, update_fragments, spool_file, copy_spool
+from cinp_utils.sync import output_file
+from cinp_utils.incremental import render_incremental
+from cinp_utils.fragment_cache import get_fragment_cache, render_fragment
+
+try:
+  from jinja2 import pass_context
+except ImportError:  # jinja2 < 3.0
+  from jinja2 import contextfilter as pass_context
 
 # from https://github.com/golang/lint/blob/master/lint.go#L767
 commonInitialisms = ( 'acl', 'api', 'ascii', 'cpu', 'css', 'dns', 'eof', 'guid', 'html', 'http', 'https', 'id', 'ip', 'json', 'lhs', 'qps', 'ram', 'rhs', 'rpc', 'sla', 'smtp', 'sql', 'ssh', 'tcp', 'tls', 'ttl', 'udp', 'ui', 'uid', 'uuid', 'uri', 'url', 'utf8', 'vm', 'xml', 'xmpp', 'xsrf', 'xss' )
@@ -20,19 +32,22 @@ def fixGoName( name ):
 
   return ''.join( word_list )
 
-include_list = []
-prefix_list = []
 
+@pass_context
+def goType( context, cinpType ):  # include_list in the context collects the imports the namespace file needs
+  if cinpType[ 'type' ] == 'DateTime':
+    context[ 'include_list' ].append( '"time"' )
 
-def goType( cinpType ):
-  global include_list
+  return goTypeName( cinpType )
 
+
+@memoize
+def goTypeName( cinpType ):
   prefix = ''
   if cinpType.get( 'is_array', False ):
     prefix = '[]'
 
   if cinpType[ 'type' ] == 'DateTime':
-    include_list.append( '"time"' )
     return prefix + 'time.Time'
 
   elif cinpType[ 'type' ] == 'Map':
@@ -48,6 +63,7 @@ def goType( cinpType ):
     return prefix + 'string'
 
 
+@memoize
 def goEmptyVal( cinpType ):
   is_array = cinpType.get( 'is_array', False )
 
@@ -118,9 +134,8 @@ def goNewVal( cinpType ):
       return '""'
 
 
-def goStringId( cinpType ):
-  global include_list
-
+@pass_context
+def goStringId( context, cinpType ):
   if cinpType.get( 'is_array', False ):
     raise ValueError( 'Can not string convert an array' )
 
@@ -131,11 +146,11 @@ def goStringId( cinpType ):
     raise ValueError( 'Can not use Map as an Id' )
 
   elif cinpType[ 'type' ] == 'Integer':
-    include_list.append( '"strconv"' )
+    context[ 'include_list' ].append( '"strconv"' )
     return 'strconv.FormatInt(int64(id), 10)'
 
   elif cinpType[ 'type' ] == 'Boolean':
-    include_list.append( '"strconv"' )
+    context[ 'include_list' ].append( '"strconv"' )
     return 'strconv.FormatBool(id)'
 
   else:
@@ -149,14 +164,15 @@ def strip_quotes( value ):
   return value
 
 
-env = Environment()
+template_map = {}  # filled in below, the templates are compiled when first used
+env = get_environment( 'go', __file__, template_map )
 env.filters[ 'goname' ] = goName
 env.filters[ 'gotype' ] = goType
 env.filters[ 'goemptyval' ] = goEmptyVal
 env.filters[ 'gonewval' ] = goNewVal
 env.filters[ 'gostrid' ] = goStringId
 env.filters[ 'fixgoname' ] = fixGoName
-service_template = env.from_string( """// Package {{ service }} - Automatically generated by cinp-codegen from {{ url }} at {{ timestamp }}
+template_map[ 'service' ] = """// Package {{ service }} - Automatically generated by cinp-codegen from {{ url }}{% if timestamp %} at {{ timestamp }}{% endif %}
 package {{ service }}
 
 import (
@@ -218,9 +234,9 @@ func (s *{{ service|title }}) SetHeader(name string, value string) {
 func (s *{{ service|title }}) ClearHeader(name string) {
 	s.cinp.ClearHeader(name)
 }
-""" )  # noqa
+"""  # noqa
 
-ns_template = env.from_string( """// Package {{ service }} - (version: "{{ api_version }}") - Automatically generated by cinp-codegen from {{ url }} at {{ timestamp }}{% if doc %}
+template_map[ 'ns' ] = """// Package {{ service }} - (version: "{{ api_version }}") - Automatically generated by cinp-codegen from {{ url }}{% if timestamp %} at {{ timestamp }}{% endif %}{% if doc %}
  /*
 {{ doc }}
 */{% endif %}
@@ -230,9 +246,9 @@ import ({% for item in include_list %}
 	{{ item }}{% endfor %}
 )
 
-""" )  # noqa
+"""  # noqa
 
-model_template = env.from_string( """{% set model_name = prefix|title + name -%}
+template_map[ 'model' ] = """{% set model_name = prefix|title + name -%}
 // {{ model_name }} - Model {{ name }}({{ url }})
 /*
 {{ doc }}
@@ -357,102 +373,174 @@ func ({% if action.static %}service *{{ service|title }}{% else %}object *{{ mod
 
 	return {% if action.return_type %}result, {% endif %}nil
 }
-{% endfor %}{% endif %}""")  # noqa
+{% endfor %}{% endif %}"""  # noqa
 
-register_template = env.from_string( """func register{{ prefix }}(cinp *cinp.CInP) { {%- for model in model_list %}
+template_map[ 'register' ] = """func register{{ prefix }}(cinp *cinp.CInP) { {%- for model in model_list %}
 	cinp.RegisterType("{{ model.url }}", reflect.TypeOf((*{{ prefix|title + model.name }})(nil)).Elem()){% endfor %}
 }
 
-""" )  # noqa
+"""  # noqa
 
 
-def service( wrk_dir, header_map ):
-  open( os.path.join( wrk_dir, 'service.go' ), 'w' ).write( service_template.render( prefix_list=prefix_list, **header_map ) )
-
-
-def do_namespace( wrk_dir, header_map, prefix, namespace ):
-  global include_list, prefix_list
-
-  if prefix:
-    filename = 'ns_{0}{1}.go'.format( prefix, namespace[ 'name' ] )  # TODO: make sure this is filesystem safe
-    prefix = '{0}{1}'.format( prefix, namespace[ 'name' ] )
-  else:
-    filename = 'ns_{0}.go'.format( namespace[ 'name' ] )  # TODO: make sure this is filesystem safe
-    prefix = namespace[ 'name' ]
-
-  include_list = []
+class GoRenderer():
+  """
+  Renders the go package for one API, a file per Namespace and service.go.
+  The state of a render is kept on the instance, so renders can run one
+  after the other or at the same time.
+  """
+  def __init__( self, wrk_dir, header_map ):
+    super().__init__()
+    self.wrk_dir = wrk_dir
+    self.header_map = dict( header_map )
+    self.fragment_cache = get_fragment_cache( 'go', __file__ )
+    self.prefix_list = []
 
-  if namespace[ 'model_list' ]:
-    include_list.append( '"context"' )
-    include_list.append( '"reflect"' )
-    include_list.append( 'cinp "github.com/cinp/go"' )
+  def service( self ):
+    with output_file( os.path.join( self.wrk_dir, 'service.go' ) ) as fp:
+      env.get_template( 'service' ).stream( prefix_list=self.prefix_list, **self.header_map ).dump( fp )
 
-  value_map = {
-                'service': header_map[ 'service' ],
-                'timestamp': header_map[ 'timestamp' ],
-                'name': namespace[ 'name' ],
-                'url': namespace[ 'url' ],
-                'doc': namespace[ 'doc' ],
-                'api_version': namespace[ 'api_version' ]
-              }
+  def namespace_filename( self, prefix ):
+    return os.path.join( self.wrk_dir, 'ns_{0}.go'.format( prefix ) )  # TODO: make sure this is filesystem safe
 
-  with open( os.path.join( wrk_dir, filename ), 'w' ) as fp:
-    model_buff = ''
+  def render_namespace( self, namespace ):
+    prefix = ''.join( namespace[ 'path' ] )
 
-    for model in namespace[ 'model_list' ]:
-      model_buff += render_model( header_map[ 'service' ], prefix, model )
-
-    include_list = sorted( list( set( include_list ) ), key=strip_quotes )
-
-    fp.write( ns_template.render( include_list=include_list, **value_map ) )
-    fp.write( model_buff )
+    include_list = []
 
     if namespace[ 'model_list' ]:
-      fp.write( register_template.render( model_list=namespace[ 'model_list' ], prefix=prefix ) )
-      prefix_list.append( prefix )
-
-  for child in namespace[ 'namespace_list' ]:
-    do_namespace( wrk_dir, header_map, prefix, child )
-
-
-def render_model( service, prefix, model ):
-  global include_list
-
-  if 'LIST' not in model[ 'not_allowed_verb_list' ]:
-    include_list.append( '"fmt"' )
+      include_list.append( '"context"' )
+      include_list.append( '"reflect"' )
+      include_list.append( 'cinp "github.com/cinp/go"' )
+
+    value_map = {
+                  'service': self.header_map[ 'service' ],
+                  'timestamp': self.header_map[ 'timestamp' ],
+                  'name': namespace[ 'name' ],
+                  'url': namespace[ 'url' ],
+                  'doc': namespace[ 'doc' ],
+                  'api_version': namespace[ 'api_version' ]
+                }
+
+    with output_file( self.namespace_filename( prefix ) ) as fp, spool_file() as model_fp:  # the models are rendered first to collect the imports for the header
+      for model in namespace[ 'model_list' ]:
+        self.write_model( model_fp, prefix, model, include_list )
+
+      include_list = sorted( list( set( include_list ) ), key=strip_quotes )
+
+      env.get_template( 'ns' ).stream( include_list=include_list, **value_map ).dump( fp )
+      copy_spool( model_fp, fp )
+
+      if namespace[ 'model_list' ]:
+        env.get_template( 'register' ).stream( model_list=namespace[ 'model_list' ], prefix=prefix ).dump( fp )
+        self.prefix_list.append( prefix )
+        return prefix
+
+    return None
+
+  def render_namespace_list( self, namespace_list ):
+    """
+    Renders each namespace without its children, returns the list of
+    namespace prefixes for service.go to register, None for the namespaces
+    without models.
+    """
+    return [ self.render_namespace( namespace ) for namespace in namespace_list ]
+
+  def render_file_list( self, namespace_list ):
+    """
+    Renders the file of each namespace, returns the list of their prefixes.
+    """
+    for namespace in namespace_list:
+      self.render_namespace( namespace )
+
+    return [ ''.join( namespace[ 'path' ] ) for namespace in namespace_list ]
+
+  def render_incremental( self, root, fragment_map, dirty_set, executor=None, jobs=1 ):
+    """
+    Renders the files of the namespaces in dirty_set, and those whose file is
+    missing, see incremental.  The fragment of a namespace is the prefix of
+    its file, the files of namespaces that are gone are removed.  Returns
+    the fragment map of this render.
+    """
+    root = ensure_ir( root )
+    self.header_map[ 'api_version' ] = root[ 'api_version' ]
+    namespace_list = [ namespace for _, namespace in iter_tree( dict( root, name='' ) ) ]
+    if dirty_set is not None:
+      dirty_set = dirty_set | set( [ namespace[ 'url' ] for namespace in namespace_list if not os.path.exists( self.namespace_filename( ''.join( namespace[ 'path' ] ) ) ) ] )
+
+    old_fragment_map = fragment_map
+    fragment_map = update_fragments( self.render_file_list, namespace_list, [ namespace[ 'url' ] for namespace in namespace_list ], fragment_map, dirty_set, executor, jobs )
+
+    for prefix in set( old_fragment_map.values() ) - set( fragment_map.values() ):
+      try:
+        os.unlink( self.namespace_filename( prefix ) )
+      except FileNotFoundError:
+        pass
+
+    self.prefix_list = [ ''.join( namespace[ 'path' ] ) for namespace in namespace_list if namespace[ 'model_list' ] ]
+    self.service()
+    return fragment_map
+
+  def write_model( self, fp, prefix, model, include_list ):
+    if 'LIST' not in model[ 'not_allowed_verb_list' ]:
+      include_list.append( '"fmt"' )
+
+    if model[ 'id_field_name' ] is not None and model[ 'id_field' ] is None:
+      raise ValueError( 'Unable to find id field "{0}" in model "{1}"({2})'.format( model[ 'id_field_name' ], model[ 'name' ], prefix ) )
 
-  id_field = None
-  if model[ 'id_field_name' ] is not None:
-    for field in model[ 'field_list' ]:
-      if field[ 'name' ] == model[ 'id_field_name' ]:
-        id_field = field
-        break
+    value_map = {
+                  'service': self.header_map[ 'service' ],
+                  'prefix': prefix,
+                  'name': model[ 'name' ],
+                  'url': model[ 'url' ],
+                  'doc': model[ 'doc' ],
+                  'field_list': model[ 'field_list' ],
+                  'constant_map': model[ 'constant_map' ],
+                  'id_field': model[ 'id_field' ],
+                  'not_allowed_verb_list': model[ 'not_allowed_verb_list' ],
+                  'query_filter_fields': model[ 'query_filter_fields' ],
+                  'query_sort_fields': model[ 'query_sort_fields' ],
+                  'list_filter_map_names': [ '"{0}"'.format( i ) for i in model[ 'list_filter_map' ].keys() ],
+                  'action_list': model[ 'action_list' ],
+                  'include_list': []  # the imports the model needs, goType adds to it
+                }
+
+    text, model_include_list = render_fragment( self.fragment_cache, lambda: [ env.get_template( 'model' ).render( **value_map ), value_map[ 'include_list' ] ], 'model', dict( value_map, include_list=None ) )
+    include_list += model_include_list
+    fp.write( text )
+
+  def render( self, root, executor=None, jobs=1 ):
+    """
+    Renders the tree from root, with an executor the namespace files are
+    rendered in it across jobs.
+    """
+    root = ensure_ir( root )
+    if executor is None:
+      self.stream_render( iter_tree( root ) )
+      return
+
+    self.header_map[ 'api_version' ] = root[ 'api_version' ]
+    namespace_list = [ namespace for _, namespace in iter_tree( dict( root, name='' ) ) ]
+
+    self.prefix_list = [ prefix for prefix in map_fragments( self.render_namespace_list, namespace_list, executor, jobs ) if prefix is not None ]
+    self.service()
+
+  def stream_render( self, namespace_iter ):
+    for parent, namespace in iter_ir( namespace_iter ):
+      if parent is None:
+        self.header_map[ 'api_version' ] = namespace[ 'api_version' ]
+        namespace = dict( namespace, name='' )
+
+      self.render_namespace( namespace )
+
+    self.service()
+
+
+def go_render_func( wrk_dir, header_map, root, executor=None, jobs=1, incremental=False ):
+  if incremental:
+    render_incremental( GoRenderer( wrk_dir, header_map ), __file__, root, executor, jobs )
+  else:
+    GoRenderer( wrk_dir, header_map ).render( root, executor, jobs )
 
-    if id_field is None:
-      raise ValueError( 'Unable to find id field "{0}" in model "{1}"({2})'.format( model[ 'id_field_name' ], model[ 'name' ], prefix ) )
 
-  value_map = {
-                'service': service,
-                'prefix': prefix,
-                'name': model[ 'name' ],
-                'url': model[ 'url' ],
-                'doc': model[ 'doc' ],
-                'field_list': model[ 'field_list' ],
-                'constant_map': model[ 'constant_map' ],
-                'id_field': id_field,
-                'not_allowed_verb_list': model[ 'not_allowed_verb_list' ],
-                'query_filter_fields': model[ 'query_filter_fields' ],
-                'query_sort_fields': model[ 'query_sort_fields' ],
-                'list_filter_map_names': [ '"{0}"'.format( i ) for i in model[ 'list_filter_map' ].keys() ],
-                'action_list': model[ 'action_list' ]
-              }
-
-  return model_template.render( **value_map )
-
-
-def go_render_func( wrk_dir, header_map, root ):
-  header_map[ 'api_version' ] = root[ 'api_version' ]
-  root[ 'name' ] = ''
-
-  do_namespace( wrk_dir, header_map, '', root )
-  service( wrk_dir, header_map )
+def go_stream_render_func( wrk_dir, header_map, namespace_iter ):
+  GoRenderer( wrk_dir, header_map ).stream_render( namespace_iter )
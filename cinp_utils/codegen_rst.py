@@ -1,5 +1,13 @@
+import io
 import os
-from jinja2 import Environment
+
+from cinp_utils.ir import ensure_ir, iter_ir
+from cinp_utils.spec import iter_tree
+from cinp_utils.templates import get_environment
+from cinp_utils.fragments import map_fragments, update_fragments
+from cinp_utils.sync import output_file
+from cinp_utils.incremental import render_incremental
+from cinp_utils.fragment_cache import get_fragment_cache, render_fragment
 
 
 def titleize( word, char='=' ):
@@ -40,23 +48,24 @@ def return_type_extract( return_type ):
   return [ ( return_type[ 'type' ], str( return_type.get( 'length', '' ) ), '' if return_type.get( 'default', '' ) is None else str( return_type.get( 'default', '' ) ), 'Yes' if return_type.get( 'is_array', False ) else ' ', str( return_type.get( 'choice_list', '' ) ), str( return_type.get( 'allowed_scheme_list', '' ) ), return_type.get( 'uri', '' ), return_type.get( 'doc', '' ) ) ]
 
 
-env = Environment()
+template_map = {}  # filled in below, the templates are compiled when first used
+env = get_environment( 'rst', __file__, template_map )
 env.filters[ 'titleize' ] = titleize
 env.filters[ 'table' ] = table
 env.filters[ 'parm_extract' ] = parm_extract
 env.filters[ 'field_extract' ] = field_extract
 env.filters[ 'return_type_extract' ] = return_type_extract
 
-header_template = env.from_string( """==========================={{ service|titleize }}
+template_map[ 'header' ] = """==========================={{ service|titleize }}
 CInP API Documentation for {{ service }}
 ==========================={{ service|titleize }}
 
-Automatically generated by cinp-codegen from {{ url }} at {{ timestamp }} for api version *{{ api_version }}*
+Automatically generated by cinp-codegen from {{ url }}{% if timestamp %} at {{ timestamp }}{% endif %} for api version *{{ api_version }}*
 
 
-""" )
+"""
 
-ns_template = env.from_string( """Namespace - {{ name }}
+template_map[ 'ns' ] = """Namespace - {{ name }}
 ============{{ name|titleize }}
 
 URL: *{{ url }}*
@@ -68,9 +77,9 @@ API Version: *{{ api_version }}*
   {{ doc }}
 {% endif %}
 
-""" )
+"""
 
-model_template = env.from_string( """Model - {{ name }}
+template_map[ 'model' ] = """Model - {{ name }}
 --------{{ name|titleize( '-' ) }}
 
 URL: *{{ url }}*
@@ -97,9 +106,9 @@ List Filters
 Fields
 ~~~~~~
 {{ field_list|field_extract|table( [ 'Name', 'Type', 'Length', 'Default', 'Array', 'Choice List', 'Schema List', 'Model', 'Doc' ] ) }}{% endif %}
-""" )
+"""
 
-action_template = env.from_string( """Action - {{ name }}
+template_map[ 'action' ] = """Action - {{ name }}
 ~~~~~~~~~{{ name|titleize( '~' ) }}
 
 URL: *{{ url }}*
@@ -117,55 +126,144 @@ Parameters
 ~~~~~~~~~~
 {{ paramater_list|parm_extract|table( [ 'Name', 'Type', 'Length', 'Array', 'Choice List', 'Schema List', 'Model', 'Doc' ] ) }}{% endif %}
 
-""" )
+"""
+
 
+class RSTRenderer():
+  """
+  Renders the reStructuredText documentation for one API into api.rst.
+  """
+  def __init__( self, wrk_dir, header_map ):
+    super().__init__()
+    self.wrk_dir = wrk_dir
+    self.header_map = dict( header_map )
+    self.fragment_cache = get_fragment_cache( 'rst', __file__ )
 
-def write_model( fp, model ):
-  value_map = {
-                'name': model[ 'name' ],
-                'url': model[ 'url' ],
-                'doc': model[ 'doc' ].strip().replace( '\n', '\n  ' ),
-                'constant_map': model[ 'constant_map' ],
-                'list_filter_map': model[ 'list_filter_map' ],
-                'field_list': model[ 'field_list' ],
-                'not_allowed_verb_list': model[ 'not_allowed_verb_list' ],
-                'id_field_name': model[ 'id_field_name' ],
-              }
+  def write_model( self, fp, model ):
+    fp.write( render_fragment( self.fragment_cache, lambda: self.render_model( model ), 'model', model ) )
 
-  fp.write( model_template.render( **value_map ) )
-  for action in model[ 'action_list' ]:
+  def render_model( self, model ):
+    fp = io.StringIO()
     value_map = {
-                  'name': action[ 'name' ],
-                  'url': action[ 'url' ],
-                  'static': action[ 'static' ],
-                  'doc': action.get( 'doc', '' ).strip().replace( '\n', '\n  ' ),
-                  'return_type': action.get( 'return_type', {} ),
-                  'paramater_list': action.get( 'paramater_list', [] )
+                  'name': model[ 'name' ],
+                  'url': model[ 'url' ],
+                  'doc': model[ 'doc' ].strip().replace( '\n', '\n  ' ),
+                  'constant_map': model[ 'constant_map' ],
+                  'list_filter_map': model[ 'list_filter_map' ],
+                  'field_list': model[ 'field_list' ],
+                  'not_allowed_verb_list': model[ 'not_allowed_verb_list' ],
+                  'id_field_name': model[ 'id_field_name' ],
                 }
-    fp.write( action_template.render( **value_map ) )
-
-
-def write_namespace( fp, namespace ):
-  value_map = {
-                'name': namespace[ 'name' ],
-                'url': namespace[ 'url' ],
-                'doc': namespace.get( 'doc', '' ).strip().replace( '\n', '\n  ' ),
-                'api_version': namespace[ 'api_version' ]
-              }
-  fp.write( ns_template.render( **value_map ) )
-
-  for model in namespace[ 'model_list' ]:
-    write_model( fp, model )
 
-  for child in namespace[ 'namespace_list' ]:
-    write_namespace( fp, child )
-
-
-def rst_render_func( wrk_dir, header_map, root ):
-  header_map[ 'api_version' ] = root[ 'api_version' ]
+    env.get_template( 'model' ).stream( **value_map ).dump( fp )
+    for action in model[ 'action_list' ]:
+      value_map = {
+                    'name': action[ 'name' ],
+                    'url': action[ 'url' ],
+                    'static': action[ 'static' ],
+                    'doc': action.get( 'doc', '' ).strip().replace( '\n', '\n  ' ),
+                    'return_type': action.get( 'return_type', {} ),
+                    'paramater_list': action.get( 'paramater_list', [] )
+                  }
+      env.get_template( 'action' ).stream( **value_map ).dump( fp )
+
+    return fp.getvalue()
+
+  def write_namespace_header( self, fp, namespace ):
+    value_map = {
+                  'name': namespace[ 'name' ],
+                  'url': namespace[ 'url' ],
+                  'doc': namespace.get( 'doc', '' ).strip().replace( '\n', '\n  ' ),
+                  'api_version': namespace[ 'api_version' ]
+                }
+    env.get_template( 'ns' ).stream( **value_map ).dump( fp )
+
+  def write_namespace_entry( self, fp, namespace ):
+    self.write_namespace_header( fp, namespace )
+
+    for model in namespace[ 'model_list' ]:
+      self.write_model( fp, model )
+
+  def render_namespace_list( self, namespace_list ):
+    """
+    Renders each namespace without its children, returns the list of text.
+    """
+    result = []
+    for namespace in namespace_list:
+      fp = io.StringIO()
+      self.write_namespace_entry( fp, namespace )
+      result.append( fp.getvalue() )
+
+    return result
+
+  def render_model_list( self, model_list ):
+    """
+    Renders each model, returns the list of text.
+    """
+    result = []
+    for model in model_list:
+      fp = io.StringIO()
+      self.write_model( fp, model )
+      result.append( fp.getvalue() )
+
+    return result
+
+  def render_incremental( self, root, fragment_map, dirty_set, executor=None, jobs=1 ):
+    """
+    Renders the tree from root, the text of the models not in dirty_set is
+    reused from fragment_map, see incremental.  Returns the fragment map of
+    this render.
+    """
+    root = ensure_ir( root )
+    self.header_map[ 'api_version' ] = root[ 'api_version' ]
+    namespace_list = [ namespace for _, namespace in iter_tree( dict( root, name='(root)' ) ) ]
+    model_list = [ model for namespace in namespace_list for model in namespace[ 'model_list' ] ]
+    fragment_map = update_fragments( self.render_model_list, model_list, [ model[ 'url' ] for model in model_list ], fragment_map, dirty_set, executor, jobs )
+
+    with output_file( os.path.join( self.wrk_dir, 'api.rst' ) ) as fp:
+      env.get_template( 'header' ).stream( **self.header_map ).dump( fp )
+      for namespace in namespace_list:
+        self.write_namespace_header( fp, namespace )
+        for model in namespace[ 'model_list' ]:
+          fp.write( fragment_map[ model[ 'url' ] ] )
+
+    return fragment_map
+
+  def render( self, root, executor=None, jobs=1 ):
+    """
+    Renders the tree from root, with an executor the namespaces are rendered
+    in it across jobs and joined back in order.
+    """
+    root = ensure_ir( root )
+    if executor is None:
+      self.stream_render( iter_tree( root ) )
+      return
+
+    self.header_map[ 'api_version' ] = root[ 'api_version' ]
+    namespace_list = [ namespace for _, namespace in iter_tree( dict( root, name='(root)' ) ) ]
+
+    with output_file( os.path.join( self.wrk_dir, 'api.rst' ) ) as fp:
+      env.get_template( 'header' ).stream( **self.header_map ).dump( fp )
+      for text in map_fragments( self.render_namespace_list, namespace_list, executor, jobs ):
+        fp.write( text )
+
+  def stream_render( self, namespace_iter ):
+    with output_file( os.path.join( self.wrk_dir, 'api.rst' ) ) as fp:
+      for parent, namespace in iter_ir( namespace_iter ):
+        if parent is None:
+          self.header_map[ 'api_version' ] = namespace[ 'api_version' ]
+          namespace = dict( namespace, name='(root)' )
+          env.get_template( 'header' ).stream( **self.header_map ).dump( fp )
+
+        self.write_namespace_entry( fp, namespace )
+
+
+def rst_render_func( wrk_dir, header_map, root, executor=None, jobs=1, incremental=False ):
+  if incremental:
+    render_incremental( RSTRenderer( wrk_dir, header_map ), __file__, root, executor, jobs )
+  else:
+    RSTRenderer( wrk_dir, header_map ).render( root, executor, jobs )
 
-  root[ 'name' ] = '(root)'
 
-  with open( os.path.join( wrk_dir, 'api.rst' ), 'w' ) as fp:
-    fp.write( header_template.render( **header_map ) )
-    write_namespace( fp, root )
+def rst_stream_render_func( wrk_dir, header_map, namespace_iter ):
+  RSTRenderer( wrk_dir, header_map ).stream_render( namespace_iter )
@@ -1,9 +1,13 @@
+import io
 import os
-from jinja2 import Environment
 
-
-class_buff = ''
-model_uri_lookup_map = {}
+from cinp_utils.ir import ensure_ir, memoize
+from cinp_utils.spec import iter_tree
+from cinp_utils.templates import get_environment
+from cinp_utils.fragments import map_fragments, update_fragments, nest_fragments, spool_file, copy_spool
+from cinp_utils.sync import output_file
+from cinp_utils.incremental import render_incremental
+from cinp_utils.fragment_cache import get_fragment_cache, render_fragment
 
 
 def tsChoiceConvert( choice_list ):
@@ -22,6 +26,15 @@ def tsChoiceConvert( choice_list ):
   return ' | '.join( result_list )
 
 
+def tsClassName( field ):
+  if field.get( 'model', None ) is None:
+    raise Exception( 'Unable to find model at "{0}"'.format( field[ 'uri' ] ) )
+
+  path, name = field[ 'model' ]
+  return '{0}_{1}'.format( '_'.join( path ), name )
+
+
+@memoize
 def tsType( field ):
   suffix = ''
   if field.get( 'is_array', False ):
@@ -42,10 +55,7 @@ def tsType( field ):
     return 'boolean' + suffix
 
   elif field[ 'type' ] == 'Model':
-    try:
-      return model_uri_lookup_map[ field[ 'uri' ] ] + suffix
-    except KeyError:
-      raise Exception( 'Unable to find model at "{0}"'.format( field[ 'uri' ] ) )
+    return tsClassName( field ) + suffix
 
   if choices is not None:
     return choices
@@ -53,6 +63,7 @@ def tsType( field ):
   return 'string' + suffix
 
 
+@memoize
 def tsInit( field ):
   is_array = field.get( 'is_array', False )
   default = field.get( 'default', None )
@@ -76,6 +87,7 @@ def tsInit( field ):
     return default
 
 
+@memoize
 def tsEmptyVal( field ):
   is_array = field.get( 'is_array', False )
 
@@ -104,13 +116,10 @@ def tsEmptyVal( field ):
       return 'false'
 
   elif field[ 'type' ] == 'Model':
-    try:
-      if is_array:
-        return '[ new {0}() ]'.format( model_uri_lookup_map[ field[ 'uri' ] ] )
-      else:
-        return 'new {0}()'.format( model_uri_lookup_map[ field[ 'uri' ] ] )
-    except KeyError:
-      raise Exception( 'Unable to find model at "{0}"'.format( field[ 'uri' ] ) )
+    if is_array:
+      return '[ new {0}() ]'.format( tsClassName( field ) )
+    else:
+      return 'new {0}()'.format( tsClassName( field ) )
 
   else:
     if is_array:
@@ -129,15 +138,13 @@ def tsParmValue( field ):
   return field[ 'name' ]
 
 
+@memoize
 def tsReturn( field, name ):
   if field[ 'type' ] == 'Model':
-    try:
-      if field.get( 'is_array', False ):
-        return '{1}.map( ( val: string ) => {{ return new {0}( this, val ); }} )'.format( model_uri_lookup_map[ field[ 'uri' ] ], name )
-      else:
-        return 'new {0}( this, {1} as {0} )'.format( model_uri_lookup_map[ field[ 'uri' ] ], name )
-    except KeyError:
-      raise Exception( 'Unable to find model at "{0}"'.format( field[ 'uri' ] ) )
+    if field.get( 'is_array', False ):
+      return '{1}.map( ( val: string ) => {{ return new {0}( this, val ); }} )'.format( tsClassName( field ), name )
+    else:
+      return 'new {0}( this, {1} as {0} )'.format( tsClassName( field ), name )
 
   return '( {0} as {1} )'.format( name, tsType( field ) )
 
@@ -154,14 +161,16 @@ def tsParamaters( paramater_list ):
   return func_in_parms, func_obj_parms, func_out_parms, inline_type
 
 
-env = Environment( extensions=[ 'jinja2.ext.do' ] )
+template_map = {}  # filled in below, the templates are compiled when first used
+env = get_environment( 'rust', __file__, template_map, extensions=[ 'jinja2.ext.do' ] )
 env.filters[ 'tstype' ] = tsType
+env.filters[ 'tsclassname' ] = tsClassName
 env.filters[ 'tsParamaters' ] = tsParamaters
 env.filters[ 'tsinit' ] = tsInit
 env.filters[ 'tsemptyval' ] = tsEmptyVal
 env.filters[ 'tsreturn' ] = tsReturn
 env.filters[ 'tsparmvalue' ] = tsParmValue
-service_header = env.from_string( """// Automatically generated by cinp-codegen from {{ url }} at {{ timestamp }}
+template_map[ 'service_header' ] = """// Automatically generated by cinp-codegen from {{ url }}{% if timestamp %} at {{ timestamp }}{% endif %}
 
 use cinp::CInP;
 use serde::{Deserialize, Serialize};
@@ -192,23 +201,23 @@ impl {{ service }}
 
   	return r.APIVersion, nil
   }
-""" )
+"""
 
-service_footer = env.from_string( """
+template_map[ 'service_footer' ] = """
 }
-""" )
+"""
 
-ns_header = env.from_string( """
+template_map[ 'ns_header' ] = """
   // Namespace {{ name }} at {{ url }} version {{ api_version }}
 /*
 {{ doc }}
 */
 
-""" )
+"""
 
-ns_footer = env.from_string( """
+template_map[ 'ns_footer' ] = """
   // Namespace {{ name }} (end)
-""" )
+"""
 
 
 """
@@ -221,7 +230,7 @@ struct {{ name }}
 }
 """
 
-model_methods_template = env.from_string( """
+template_map[ 'model_methods' ] = """
   // Model {{ name }} at {{ url }}
 {% if 'GET' not in not_allowed_verb_list and id_field %}
   async {{ model_name }}_get( id: {{ id_field|tstype }} ): Promise<{{ model_name }}>
@@ -295,9 +304,9 @@ model_methods_template = env.from_string( """
 
 {% endfor %}{% endif %}
   // Model {{ name }} (end)
-""" )
+"""
 
-model_class_template = env.from_string( """
+template_map[ 'model_class' ] = """
 // Model {{ name }} from {{ prefix }} at {{ url }}
 /*
 {{ doc }}
@@ -323,7 +332,7 @@ export class {{ model_name }}
 {%- if id_field %}
     else if( ( typeof source === 'string' ) && source.startsWith( '{{ url }}' ) )
     {
-      this.{{ id_field.name }} = {% if id_field.type == 'Integer' %}parseInt( source.split( ':' )[ 1 ] ){% elif id_field.type == 'Model' %}new {{ model_uri_lookup_map[ id_field.uri ] }}( service, source.split( ':' )[ 1 ] ){% else %}source.split( ':' )[ 1 ]{% endif %};
+      this.{{ id_field.name }} = {% if id_field.type == 'Integer' %}parseInt( source.split( ':' )[ 1 ] ){% elif id_field.type == 'Model' %}new {{ id_field|tsclassname }}( service, source.split( ':' )[ 1 ] ){% else %}source.split( ':' )[ 1 ]{% endif %};
     }
     else if( typeof source === '{{ id_field|tstype }}' )
     {
@@ -349,9 +358,9 @@ export class {{ model_name }}
 {%- if field.type == 'Model' %}
 {%- if field.is_array %}
     if( data.{{ field.name }} !== undefined )
-      this.{{ field.name }} = data.{{ field.name }}.map( ( uri ) => { return new {{ model_uri_lookup_map[ field.uri ] }}( this._service, uri ) } );
+      this.{{ field.name }} = data.{{ field.name }}.map( ( uri ) => { return new {{ field|tsclassname }}( this._service, uri ) } );
 {%- else %}
-    this.{{ field.name }} = data.{{ field.name }} !== null ? new {{ model_uri_lookup_map[ field.uri ] }}( this._service, data.{{ field.name }} ) : undefined;
+    this.{{ field.name }} = data.{{ field.name }} !== null ? new {{ field|tsclassname }}( this._service, data.{{ field.name }} ) : undefined;
 {%- endif %}
 {%- else %}
     this.{{ field.name }} = data.{{ field.name }};
@@ -464,103 +473,165 @@ export namespace {{ model_name }}
 {%- endif %}{% endif %}
 }
 
-""" )
-
-
-def write_model( fp, prefix, model, service ):  # TODO: throw an error if a field is named constructor, toURL or toString or starts with "_"
-  global class_buff
+"""
 
-  id_field = None
-  if model[ 'id_field_name' ] is not None:
-    for field in model[ 'field_list' ]:
-      if field[ 'name' ] == model[ 'id_field_name' ]:
-        id_field = field
-        break
 
-    if id_field is None:
+class RustRenderer():
+  """
+  Renders the Rust client for one API into one file, the model classes
+  are spooled to class_fp and written after the service.  The state of a
+  render is kept on the instance, so renders can run one after the other or
+  at the same time.
+  """
+  def __init__( self, wrk_dir, header_map ):
+    super().__init__()
+    self.wrk_dir = wrk_dir
+    self.header_map = dict( header_map )
+    self.fragment_cache = get_fragment_cache( 'rust', __file__ )
+
+  def write_model( self, fp, class_fp, prefix, model ):  # TODO: throw an error if a field is named constructor, toURL or toString or starts with "_"
+    if model[ 'id_field_name' ] is not None and model[ 'id_field' ] is None:
       raise ValueError( 'Unable to find id field "{0}" in model "{1}"({2})'.format( model[ 'id_field_name' ], model[ 'name' ], prefix ) )
 
-  constant_map = {}
-  for name, item_list in model[ 'constant_map' ].items():
-    if isinstance( item_list[0], list ):
-      constant_map[ name ] = item_list
-    else:
-      constant_map[ name ] = list( zip( item_list, item_list ) )
-
-  value_map = {
-                'service': service,
-                'prefix': prefix,
-                'name': model[ 'name' ],
-                'model_name': '{0}_{1}'.format( prefix, model[ 'name' ] ),
-                'url': model[ 'url' ],
-                'doc': model[ 'doc' ],
-                'field_list': model[ 'field_list' ],
-                'constant_map': constant_map,
-                'id_field': id_field,
-                'list_filter_map': model[ 'list_filter_map' ],
-                'not_allowed_verb_list': model[ 'not_allowed_verb_list' ],
-                'query_filter_fields': model[ 'query_filter_fields' ],
-                'query_sort_fields': model[ 'query_sort_fields' ],
-                'action_list': model[ 'action_list' ],
-                'model_uri_lookup_map': model_uri_lookup_map
-              }
-
-  fp.write( model_methods_template.render( **value_map ) )
-
-  class_buff += model_class_template.render( **value_map )
-
-
-def write_namespace( fp, prefix, namespace, service ):
-  if prefix:
-    prefix = '{0}_{1}'.format( prefix, namespace[ 'name' ] )
-  else:
-    prefix = namespace[ 'name' ]
-
-  value_map = {
-                'name': namespace[ 'name' ],
-                'url': namespace[ 'url' ],
-                'doc': namespace[ 'doc' ],
-                'api_version': namespace[ 'api_version' ]
-              }
-  fp.write( ns_header.render( **value_map ) )
-
-  for model in namespace[ 'model_list' ]:
-    write_model( fp, prefix, model, service )
-
-  for child in namespace[ 'namespace_list' ]:
-    write_namespace( fp, prefix, child, service )
-
-  fp.write( ns_footer.render( **value_map ) )
-
+    value_map = {
+                  'service': self.header_map[ 'service' ],
+                  'prefix': prefix,
+                  'name': model[ 'name' ],
+                  'model_name': '{0}_{1}'.format( prefix, model[ 'name' ] ),
+                  'url': model[ 'url' ],
+                  'doc': model[ 'doc' ],
+                  'field_list': model[ 'field_list' ],
+                  'constant_map': model[ 'constant_pair_map' ],
+                  'id_field': model[ 'id_field' ],
+                  'list_filter_map': model[ 'list_filter_map' ],
+                  'not_allowed_verb_list': model[ 'not_allowed_verb_list' ],
+                  'query_filter_fields': model[ 'query_filter_fields' ],
+                  'query_sort_fields': model[ 'query_sort_fields' ],
+                  'action_list': model[ 'action_list' ]
+                }
+
+    methods, model_class = render_fragment( self.fragment_cache, lambda: [ env.get_template( 'model_methods' ).render( **value_map ), env.get_template( 'model_class' ).render( **value_map ) ], 'model', value_map )
+    fp.write( methods )
+    class_fp.write( model_class )
+
+  def namespace_value_map( self, namespace ):
+    return {
+             'name': namespace[ 'name' ],
+             'url': namespace[ 'url' ],
+             'doc': namespace[ 'doc' ],
+             'api_version': namespace[ 'api_version' ]
+           }
+
+  def write_namespace( self, fp, class_fp, namespace ):
+    prefix = '_'.join( namespace[ 'path' ] )
+    value_map = self.namespace_value_map( namespace )
+    env.get_template( 'ns_header' ).stream( **value_map ).dump( fp )
+
+    for model in namespace[ 'model_list' ]:
+      self.write_model( fp, class_fp, prefix, model )
+
+    for child in namespace[ 'namespace_list' ]:
+      self.write_namespace( fp, class_fp, child )
+
+    env.get_template( 'ns_footer' ).stream( **value_map ).dump( fp )
+
+  def render_namespace_list( self, namespace_list ):
+    """
+    Renders each namespace without its children, returns the list of
+    ( header and models, footer, model classes ).
+    """
+    result = []
+    for namespace in namespace_list:
+      prefix = '_'.join( namespace[ 'path' ] )
+      value_map = self.namespace_value_map( namespace )
+      fp = io.StringIO()
+      class_fp = io.StringIO()
+      env.get_template( 'ns_header' ).stream( **value_map ).dump( fp )
+      for model in namespace[ 'model_list' ]:
+        self.write_model( fp, class_fp, prefix, model )
+
+      result.append( ( fp.getvalue(), env.get_template( 'ns_footer' ).render( **value_map ), class_fp.getvalue() ) )
+
+    return result
+
+  def write_namespace_list( self, fp, class_fp, root, executor, jobs ):
+    parent_list, namespace_list = zip( *iter_tree( root ) )
+    head_list, tail_list, class_list = zip( *map_fragments( self.render_namespace_list, list( namespace_list ), executor, jobs ) )
+    fp.write( nest_fragments( parent_list, head_list, tail_list ) )
+    for text in class_list:
+      class_fp.write( text )
+
+  def render_model_list( self, task_list ):
+    """
+    Renders each ( prefix, model ), returns the list of ( methods, class ).
+    """
+    result = []
+    for prefix, model in task_list:
+      fp = io.StringIO()
+      class_fp = io.StringIO()
+      self.write_model( fp, class_fp, prefix, model )
+      result.append( ( fp.getvalue(), class_fp.getvalue() ) )
+
+    return result
+
+  def render_incremental( self, root, fragment_map, dirty_set, executor=None, jobs=1 ):
+    """
+    Renders the tree from root, the methods and class of the models not in
+    dirty_set are reused from fragment_map, see incremental.  Returns the
+    fragment map of this render.
+    """
+    self.header_map[ 'api_version' ] = root[ 'api_version' ]
+    root = dict( ensure_ir( root ), name='' )
+    parent_list, namespace_list = zip( *iter_tree( root ) )
+    task_list = [ ( '_'.join( namespace[ 'path' ] ), model ) for namespace in namespace_list for model in namespace[ 'model_list' ] ]
+    fragment_map = update_fragments( self.render_model_list, task_list, [ model[ 'url' ] for _, model in task_list ], fragment_map, dirty_set, executor, jobs )
+
+    head_list = []
+    tail_list = []
+    class_list = []
+    for namespace in namespace_list:
+      value_map = self.namespace_value_map( namespace )
+      head_fp = io.StringIO()
+      env.get_template( 'ns_header' ).stream( **value_map ).dump( head_fp )
+      for model in namespace[ 'model_list' ]:
+        methods, model_class = fragment_map[ model[ 'url' ] ]
+        head_fp.write( methods )
+        class_list.append( model_class )
+
+      head_list.append( head_fp.getvalue() )
+      tail_list.append( env.get_template( 'ns_footer' ).render( **value_map ) )
+
+    with output_file( os.path.join( self.wrk_dir, '{0}.rs'.format( self.header_map[ 'service' ] ) ) ) as fp:  # TODO: make sure this is filsystem safe
+      env.get_template( 'service_header' ).stream( **self.header_map ).dump( fp )
+      fp.write( nest_fragments( parent_list, head_list, tail_list ) )
+      env.get_template( 'service_footer' ).stream( **self.header_map ).dump( fp )
+      for text in class_list:
+        fp.write( text )
+
+    return fragment_map
+
+  def render( self, root, executor=None, jobs=1 ):
+    """
+    Renders the tree from root, with an executor the namespaces are rendered
+    in it across jobs and joined back in order.
+    """
+    self.header_map[ 'api_version' ] = root[ 'api_version' ]
+    root = dict( ensure_ir( root ), name='' )
+
+    with spool_file() as class_fp, output_file( os.path.join( self.wrk_dir, '{0}.rs'.format( self.header_map[ 'service' ] ) ) ) as fp:  # TODO: make sure this is filsystem safe
+      env.get_template( 'service_header' ).stream( **self.header_map ).dump( fp )
+      if executor is None:
+        self.write_namespace( fp, class_fp, root )
+      else:
+        self.write_namespace_list( fp, class_fp, root, executor, jobs )
 
-def prescan_model( prefix, model ):
-  global model_uri_lookup_map
+      env.get_template( 'service_footer' ).stream( **self.header_map ).dump( fp )
 
-  model_uri_lookup_map[ model[ 'url' ] ] = '{0}_{1}'.format( prefix, model[ 'name' ] )
+      copy_spool( class_fp, fp )
 
 
-def prescan_namespace( prefix, namespace ):
-  if prefix:
-    prefix = '{0}_{1}'.format( prefix, namespace[ 'name' ] )
+def rust_render_func( wrk_dir, header_map, root, executor=None, jobs=1, incremental=False ):
+  if incremental:
+    render_incremental( RustRenderer( wrk_dir, header_map ), __file__, root, executor, jobs )
   else:
-    prefix = namespace[ 'name' ]
-
-  for model in namespace[ 'model_list' ]:
-    prescan_model( prefix, model )
-
-  for child in namespace[ 'namespace_list' ]:
-    prescan_namespace( prefix, child )
-
-
-def rust_render_func( wrk_dir, header_map, root ):
-  header_map[ 'api_version' ] = root[ 'api_version' ]
-  root[ 'name' ] = ''
-
-  prescan_namespace( '', root )
-
-  with open( os.path.join( wrk_dir, '{0}.rs'.format( header_map[ 'service' ] ) ), 'w' ) as fp:  # TODO: make sure this is filsystem safe
-    fp.write( service_header.render( **header_map ) )
-    write_namespace( fp, '', root, header_map[ 'service' ] )
-    fp.write( service_footer.render( **header_map ) )
-
-    fp.write( class_buff )
+    RustRenderer( wrk_dir, header_map ).render( root, executor, jobs )
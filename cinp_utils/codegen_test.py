@@ -0,0 +1,99 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from cinp_utils.codegen import crawl, iter_crawl, render, render_iter, watch, get_timestamp
+
+
+def test_render_languages( cinp_server, tmp_path, read_output ):
+  spec = crawl( cinp_server.endpoint )
+  language_dir_map = render( spec, [ 'go', 'rst' ], str( tmp_path / 'both' ), 'test', timestamp='none' )
+  assert language_dir_map == { 'go': str( tmp_path / 'both' / 'go' ), 'rst': str( tmp_path / 'both' / 'rst' ) }
+
+  for language in ( 'go', 'rst' ):
+    render( spec, language, str( tmp_path / language ), 'test', timestamp='none' )
+    assert read_output( language_dir_map[ language ] ) == read_output( str( tmp_path / language ) )
+    assert os.listdir( language_dir_map[ language ] ) != []
+
+
+def test_render_iter( cinp_server, tmp_path, read_output ):
+  spec = crawl( cinp_server.endpoint )
+  for language in ( 'rst', 'python', 'go' ):
+    plain_dir = str( tmp_path / language / 'plain' )
+    stream_dir = str( tmp_path / language / 'stream' )
+    render( spec, language, plain_dir, 'test', timestamp='spec' )
+    spec_header, namespace_iter = iter_crawl( cinp_server.endpoint )
+    render_iter( dict( spec_header, timestamp=spec[ 'timestamp' ] ), namespace_iter, language, stream_dir, 'test', timestamp='spec' )  # rendered as it is crawled
+    assert read_output( stream_dir ) == read_output( plain_dir )
+
+
+def test_render_jobs( cinp_server, tmp_path, read_output ):
+  spec = crawl( cinp_server.endpoint )
+  language_list = [ 'rst', 'python', 'go', 'ts', 'rust' ]
+  render( spec, language_list, str( tmp_path / 'plain' ), 'test', timestamp='none' )
+  render( spec, language_list, str( tmp_path / 'jobs' ), 'test', render_jobs=2, timestamp='none' )
+  assert read_output( str( tmp_path / 'jobs' ) ) == read_output( str( tmp_path / 'plain' ) )
+
+
+def test_watch( cinp_server, tmp_path, monkeypatch, read_output ):
+  monkeypatch.setenv( 'SOURCE_DATE_EPOCH', '1600000000' )
+  wrk_dir = str( tmp_path / 'watch' )
+  watch_iter = watch( cinp_server.endpoint, 'test', 'go', wrk_dir, 0.05 )
+  try:
+    api_version, written_list, removed_list = next( watch_iter )
+    assert api_version == '1.0'
+    assert 'service.go' in written_list and removed_list == []
+
+    cinp_server.tree[ '/api/v1/Item' ][1][ 'doc' ] = 'Item doc v2'
+    cinp_server.set_api_version( '2.0', '/api/v1/' )
+    cinp_server.describe_list.clear()
+    api_version, written_list, removed_list = next( watch_iter )
+    assert api_version == '2.0'
+    assert written_list == [ 'ns_.go', 'service.go' ]
+    assert '/api/v1/Auth/User' not in cinp_server.describe_list  # the api-version of Auth did not change
+
+  finally:
+    watch_iter.close()
+
+  render( crawl( cinp_server.endpoint ), 'go', str( tmp_path / 'plain' ), 'test' )
+  assert read_output( wrk_dir ) == read_output( str( tmp_path / 'plain' ) )
+
+
+def test_timestamp( cinp_server, tmp_path, monkeypatch ):
+  spec = crawl( cinp_server.endpoint )
+  assert get_timestamp( spec, 'spec' ) == spec[ 'timestamp' ]
+  assert get_timestamp( spec, 'none' ) is None
+  monkeypatch.setenv( 'SOURCE_DATE_EPOCH', '1600000000' )
+  assert get_timestamp( spec, 'now' ) == '2020-09-13T12:26:40'
+  monkeypatch.setenv( 'SOURCE_DATE_EPOCH', 'soon' )
+  with pytest.raises( ValueError ):
+    get_timestamp( spec, 'now' )
+
+  with pytest.raises( ValueError ):
+    get_timestamp( spec, 'later' )
+
+  wrk_dir = str( tmp_path )
+  render( spec, 'go', wrk_dir, 'test', timestamp='none' )
+  mtime_map = dict( [ ( name, os.stat( os.path.join( wrk_dir, name ) ).st_mtime_ns ) for name in os.listdir( wrk_dir ) ] )
+  with open( os.path.join( wrk_dir, 'service.go' ), 'r' ) as fp:
+    assert 'Automatically generated by cinp-codegen from {0}\n'.format( cinp_server.endpoint ) in fp.read()
+
+  time.sleep( 0.01 )
+  render( spec, 'go', wrk_dir, 'test', timestamp='none' )
+  assert dict( [ ( name, os.stat( os.path.join( wrk_dir, name ) ).st_mtime_ns ) for name in os.listdir( wrk_dir ) ] ) == mtime_map  # nothing changed, nothing is written
+
+
+def test_render_threads( cinp_server, tmp_path, read_output ):
+  spec = crawl( cinp_server.endpoint )
+  language_list = [ 'rst', 'python', 'go', 'ts', 'rust' ]
+  for service in ( 'first', 'second' ):
+    render( spec, language_list, str( tmp_path / 'plain' / service ), service, timestamp='none' )
+
+  with ThreadPoolExecutor( max_workers=4 ) as executor:
+    future_list = [ executor.submit( render, spec, language, str( tmp_path / 'threads' / service / language ), service, timestamp='none' ) for service in ( 'first', 'second' ) for language in language_list ]
+    for future in future_list:
+      future.result()
+
+  assert read_output( str( tmp_path / 'threads' ) ) == read_output( str( tmp_path / 'plain' ) )
@@ -0,0 +1,314 @@
+import json
+import time
+import random
+import logging
+from itertools import count
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from cinp import client
+
+from cinp_utils.spec import build_tree
+from cinp_utils.records import Namespace, Model, Action
+
+RETRY_EXCEPTIONS = ( client.Timeout, client.ResponseError, client.ServerError, OSError )
+RETRY_DELAY = 0.5  # seconds, doubled for each retry
+RETRY_MAX_DELAY = 30.0
+
+
+def namespace_entry( url, item ):
+  return Namespace( {
+                      'name': item[ 'name' ],
+                      'url': url,
+                      'doc': item.get( 'doc', '' ).strip(),
+                      'api_version': item[ 'api-version' ],
+                      'model_list': [],
+                      'namespace_list': []
+                    } )
+
+
+def model_entry( url, item ):
+  return Model( {
+                  'name': item[ 'name' ],
+                  'url': url,
+                  'doc': item.get( 'doc', '' ).strip(),
+                  'constant_map': item[ 'constants' ],
+                  'list_filter_map': item[ 'list-filters' ],
+                  'field_list': item[ 'fields' ],
+                  'not_allowed_verb_list': item[ 'not-allowed-verbs' ],
+                  'query_filter_fields': item[ 'query-filter-fields' ],
+                  'query_sort_fields': item[ 'query-sort-fields' ],
+                  'id_field_name': item.get( 'id-field-name', None ),
+                  'action_list': []
+                } )
+
+
+def action_entry( url, item ):
+  return_type = item.get( 'return-type', None )
+  if return_type is not None and return_type[ 'type' ] is None:
+    return_type = None
+
+  return Action( {
+                   'name': item[ 'name' ],
+                   'url': url,
+                   'static': item[ 'static' ],
+                   'return_type': return_type,
+                   'paramater_list': item.get( 'paramaters', [] )
+                 } )
+
+
+class _Node():
+  """
+  One Namespace of the crawl, the describe results of its models and actions
+  are held in slots, so they can arrive in any order and still end up in the
+  order the server listed them in.  pending is the number of describes for
+  the Namespace, its models and actions that have not come back yet.
+  """
+  def __init__( self, url ):
+    self.url = url
+    self.fresh = False
+    self.pending = 0
+    self.result = None
+    self.model_slot_list = []
+    self.action_slot_map = {}
+    self.child_list = []
+
+
+class Crawler():
+  """
+  Walks a CInP API describing every Namespace, Model and Action.  Sibling
+  describes are run in parallel on up to jobs threads, the resulting tree is
+  the same (content and order) as a one at a time depth first walk.
+
+  If a DescribeCache is passed in, Namespaces are always described, the
+  models and actions of Namespaces whose api-version matches the cache are
+  taken from the cache.  The cache is saved once the crawl is complete.
+
+  If a CrawlStats is passed in, every describe is recorded in it.
+
+  If a Governor is passed in, every describe request waits on it first.
+
+  Describes that fail with a transient error are retried up to retries times
+  with exponential backoff.  If a Checkpoint is passed in, every completed
+  describe is written to it, and describes already in it are not made again.
+
+  If a PathFilter is passed in, Namespaces and Models it does not want are
+  never described, references to them are left as they are, see
+  PathFilter.filter_iter.
+  """
+  def __init__( self, cinp, jobs=1, cache=None, stats=None, governor=None, retries=0, checkpoint=None, path_filter=None ):
+    super().__init__()
+    self.cinp = cinp
+    self.jobs = jobs
+    self.cache = cache
+    self.stats = stats
+    self.governor = governor
+    self.retries = retries
+    self.checkpoint = checkpoint
+    self.path_filter = path_filter
+    self._executor = None
+    self._pending_map = {}
+
+  def _record( self, kind, url, start, item, outcome ):
+    if self.stats is None:
+      return
+
+    size = 0  # nothing was received for failures and the cache/checkpoint
+    if item is not None and outcome in ( 'ok', 'wrong_type' ):
+      received_size = getattr( self.cinp, 'received_size', None )
+      if received_size is not None:
+        size = received_size()
+      else:  # the plain cinp client does not say, nor compress, the JSON is about the size of the body
+        size = len( json.dumps( item, separators=( ',', ':' ) ) )
+
+    self.stats.record( kind, url, time.perf_counter() - start, size, outcome )
+
+  def _release( self, start, ok ):
+    if self.governor is not None:
+      self.governor.release( time.perf_counter() - start, ok )
+
+  def _describe( self, kind, url ):
+    retry = 0
+    while True:
+      if self.governor is not None:
+        self.governor.acquire()
+
+      start = time.perf_counter()
+      try:
+        item, type = self.cinp.describe( url )
+        break
+
+      except client.NotAuthorized:
+        self._release( start, True )
+        self._record( kind, url, start, None, 'not_authorized' )
+        logging.warning( 'Describing {0} "{1}" is not Authorized'.format( kind, url ) )
+        return None
+
+      except RETRY_EXCEPTIONS as e:
+        self._release( start, False )
+        if retry >= self.retries:
+          self._record( kind, url, start, None, 'error' )
+          raise
+
+        self._record( kind, url, start, None, 'retried' )
+        delay = min( RETRY_MAX_DELAY, RETRY_DELAY * ( 2 ** retry ) ) * random.uniform( 0.5, 1.0 )
+        retry += 1
+        logging.warning( 'Describing {0} "{1}" failed: "{2}", retry {3} of {4} in {5:.1f} seconds'.format( kind, url, e, retry, self.retries, delay ) )
+        time.sleep( delay )
+
+      except Exception:
+        self._release( start, False )
+        self._record( kind, url, start, None, 'error' )
+        raise
+
+    self._release( start, True )
+
+    if type != kind:
+      self._record( kind, url, start, item, 'wrong_type' )
+      logging.error( 'Expected {0} got "{1}"'.format( kind, type ) )
+      return None
+
+    self._record( kind, url, start, item, 'ok' )
+    return item
+
+  def _stored( self, store, kind, url, outcome ):
+    stored = store.get( url )
+    if stored is None or stored[1] != kind:
+      return None
+
+    self._record( kind, url, time.perf_counter(), stored[0], outcome )
+    return stored[0]
+
+  def _submit( self, node, kind, url, handler, *args, fresh=False ):
+    item = None
+    if self.checkpoint is not None:
+      item = self._stored( self.checkpoint, kind, url, 'resumed' )
+
+    if item is None and fresh:
+      item = self._stored( self.cache, kind, url, 'cached' )
+
+    if item is not None:
+      future = Future()
+      future.set_result( item )
+    else:
+      future = self._executor.submit( self._describe, kind, url )
+
+    node.pending += 1
+    self._pending_map[ future ] = ( handler, kind, url, node, args )
+
+  def _namespace_done( self, item, url, node ):
+    if item is None:
+      return
+
+    if self.cache is not None:
+      node.fresh = self.cache.api_version( url ) == item[ 'api-version' ]
+
+    model_url_list = item[ 'models' ]
+    child_url_list = item[ 'namespaces' ]
+    if self.path_filter is not None:
+      model_url_list = [ i for i in model_url_list if self.path_filter.want_model( i ) ]
+      child_url_list = [ i for i in child_url_list if self.path_filter.want_namespace( i ) ]
+
+    node.result = namespace_entry( url, item )
+    node.model_slot_list = [ None ] * len( model_url_list )
+    for index, model_url in enumerate( model_url_list ):
+      self._submit( node, 'Model', model_url, self._model_done, index, fresh=node.fresh )
+
+    for child_url in child_url_list:
+      child = _Node( child_url )
+      node.child_list.append( child )
+      self._submit( child, 'Namespace', child_url, self._namespace_done )
+
+  def _model_done( self, item, url, node, index ):
+    if item is None:
+      return
+
+    node.model_slot_list[ index ] = model_entry( url, item )
+    node.action_slot_map[ index ] = [ None ] * len( item[ 'actions' ] )
+    for action_index, action_url in enumerate( item[ 'actions' ] ):
+      self._submit( node, 'Action', action_url, self._action_done, index, action_index, fresh=node.fresh )
+
+  def _action_done( self, item, url, node, index, action_index ):
+    if item is None:
+      return
+
+    node.action_slot_map[ index ][ action_index ] = action_entry( url, item )
+
+  def _step( self ):
+    done, _ = wait( self._pending_map, return_when=FIRST_COMPLETED )
+    for future in done:
+      handler, kind, url, node, args = self._pending_map.pop( future )
+      item = future.result()
+      if item is not None:
+        if self.cache is not None:
+          self.cache.put( url, item, kind )
+
+        if self.checkpoint is not None:
+          self.checkpoint.put( url, item, kind )
+
+      handler( item, url, node, *args )
+      node.pending -= 1
+
+  def _finish( self, node ):
+    result = node.result
+    if result is None:
+      return None
+
+    for index, model in enumerate( node.model_slot_list ):
+      if model is None:
+        continue
+
+      model[ 'action_list' ] = [ action for action in node.action_slot_map[ index ] if action is not None ]
+      result[ 'model_list' ].append( model )
+
+    return result
+
+  def walk( self, url ):
+    """
+    Describe the Namespace at url and everything under it, yields
+    ( parent index, namespace ) in depth first order, as soon as each
+    Namespace, its models and actions are described, while the rest of the
+    crawl continues.  The parent index is the position of the parent in the
+    order yielded, None for the root.  namespace_list is left empty, see
+    spec.build_tree.
+    """
+    root = _Node( url )
+    with ThreadPoolExecutor( max_workers=self.jobs ) as executor:
+      self._executor = executor
+      self._submit( root, 'Namespace', url, self._namespace_done )
+      try:
+        counter = count()
+        stack = [ ( root, None ) ]
+        while stack:
+          node, parent = stack.pop()
+          while node.pending:
+            self._step()
+
+          namespace = self._finish( node )
+          if namespace is None:
+            continue
+
+          index = next( counter )
+          yield parent, namespace
+
+          stack += [ ( child, index ) for child in reversed( node.child_list ) ]
+
+        if self.cache is not None:
+          logging.info( '{0} describes served from cache "{1}"'.format( self.cache.hit_count, self.cache.filename ) )
+          self.cache.save()
+
+      except BaseException:
+        for future in self._pending_map:
+          future.cancel()
+
+        self._pending_map = {}
+        raise
+
+      finally:
+        self._executor = None
+
+  def crawl( self, url ):
+    """
+    Describe the Namespace at url and everything under it, returns the tree or
+    None if the Namespace at url could not be described.
+    """
+    return build_tree( self.walk( url ) )
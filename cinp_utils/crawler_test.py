@@ -0,0 +1,64 @@
+import pytest
+from cinp import client
+
+from cinp_utils import crawler
+from cinp_utils.describe_cache import Checkpoint
+from cinp_utils.codegen import crawl, render
+
+
+def test_jobs( cinp_server ):
+  cinp_server.delay_map[ '/api/v1/Auth/User' ] = 0.1  # so the describes come back out of order
+  spec = crawl( cinp_server.endpoint )
+  describe_count = len( cinp_server.describe_list )
+  assert describe_count == len( cinp_server.tree )
+
+  for jobs in ( 2, 4 ):
+    assert crawl( cinp_server.endpoint, jobs=jobs )[ 'root' ] == spec[ 'root' ]  # the same content and order
+
+  assert len( cinp_server.describe_list ) == describe_count * 3
+
+
+def test_retries( cinp_server, monkeypatch ):
+  monkeypatch.setattr( crawler, 'RETRY_DELAY', 0.01 )
+  spec = crawl( cinp_server.endpoint )
+
+  cinp_server.describe_list.clear()
+  cinp_server.fail_map[ '/api/v1/Auth/User' ] = 2
+  assert crawl( cinp_server.endpoint, retries=2 )[ 'root' ] == spec[ 'root' ]
+  assert cinp_server.describe_list.count( '/api/v1/Auth/User' ) == 3
+
+  cinp_server.fail_map[ '/api/v1/Auth/User' ] = 3
+  with pytest.raises( client.ServerError ):
+    crawl( cinp_server.endpoint, retries=2 )
+
+
+def test_resume( cinp_server, tmp_path, read_output ):
+  spec = crawl( cinp_server.endpoint )
+  filename = str( tmp_path / 'checkpoint' )
+
+  cinp_server.describe_list.clear()
+  cinp_server.fail_map[ '/api/v1/Auth/User' ] = 1
+  checkpoint = Checkpoint( filename )
+  with pytest.raises( client.ServerError ):
+    crawl( cinp_server.endpoint, retries=0, checkpoint=checkpoint )
+
+  checkpoint.close()
+
+  with open( filename, 'a' ) as fp:
+    fp.write( '["/api/v1/Auth/User", {"na' )  # the crawl died part way through writing a describe
+
+  cinp_server.describe_list.clear()
+  checkpoint = Checkpoint( filename, resume=True )
+  described_list = list( checkpoint.entry_map )
+  assert '/api/v1/' in described_list and '/api/v1/Auth/' in described_list
+  assert '/api/v1/Auth/User' not in described_list
+  resumed_spec = crawl( cinp_server.endpoint, retries=0, checkpoint=checkpoint )
+  checkpoint.remove()
+
+  assert set( cinp_server.describe_list ).isdisjoint( described_list )  # only what is missing from the checkpoint
+  assert '/api/v1/Auth/User' in cinp_server.describe_list
+  assert resumed_spec[ 'root' ] == spec[ 'root' ]
+
+  render( spec, 'go', str( tmp_path / 'plain' ), 'test', timestamp='none' )
+  render( resumed_spec, 'go', str( tmp_path / 'resumed' ), 'test', timestamp='none' )
+  assert read_output( str( tmp_path / 'resumed' ) ) == read_output( str( tmp_path / 'plain' ) )
@@ -0,0 +1,131 @@
+import os
+import json
+import hashlib
+import logging
+
+CACHE_VERSION = 1
+
+
+class DescribeCache():
+  """
+  Describe responses from the last crawl of an endpoint, keyed by url and
+  stored as JSON in cache_dir.  A Namespace reporting the same api-version as
+  the cached copy lets the models and actions under it be taken from the
+  cache instead of being described again.
+  """
+  def __init__( self, cache_dir, endpoint ):
+    super().__init__()
+    self.endpoint = endpoint
+    self.filename = os.path.join( cache_dir, '{0}.json'.format( hashlib.sha1( endpoint.encode( 'utf-8' ) ).hexdigest() ) )
+    self.entry_map = {}
+    self.current_map = {}
+    self.hit_count = 0
+
+    try:
+      with open( self.filename, 'r' ) as fp:
+        data = json.load( fp )
+
+    except FileNotFoundError:
+      return
+
+    except ValueError as e:
+      logging.warning( 'Ignoring corrupt describe cache "{0}": {1}'.format( self.filename, e ) )
+      return
+
+    if data.get( 'version' ) != CACHE_VERSION or data.get( 'endpoint' ) != endpoint:
+      logging.warning( 'Ignoring describe cache "{0}", it is for a different version or endpoint'.format( self.filename ) )
+      return
+
+    self.entry_map = data[ 'entry_map' ]
+
+  def get( self, url ):
+    """
+    returns the cached ( item, type ) for url, or None
+    """
+    try:
+      item, type = self.entry_map[ url ]
+    except KeyError:
+      return None
+
+    self.hit_count += 1
+    return item, type
+
+  def api_version( self, url ):
+    """
+    returns the api-version of the cached Namespace at url, or None
+    """
+    try:
+      item, type = self.entry_map[ url ]
+    except KeyError:
+      return None
+
+    if type != 'Namespace':
+      return None
+
+    return item.get( 'api-version', None )
+
+  def put( self, url, item, type ):
+    self.current_map[ url ] = [ item, type ]
+
+  def save( self ):
+    """
+    Write out the entries seen this crawl, entries that were not seen are
+    dropped so the cache does not grow with urls the server no longer has.
+    """
+    os.makedirs( os.path.dirname( self.filename ), exist_ok=True )
+    tmp_filename = '{0}.tmp'.format( self.filename )
+    with open( tmp_filename, 'w' ) as fp:
+      json.dump( { 'version': CACHE_VERSION, 'endpoint': self.endpoint, 'entry_map': self.current_map }, fp, separators=( ',', ':' ) )
+
+    os.replace( tmp_filename, self.filename )
+
+
+class Checkpoint():
+  """
+  Journal of the describes completed by a crawl, one JSON line appended per
+  describe as it comes back.  If the crawl dies, a resumed crawl loads the
+  journal and only describes what is not in it.
+  """
+  def __init__( self, filename, resume=False ):
+    super().__init__()
+    self.filename = filename
+    self.entry_map = {}
+
+    if resume:
+      try:
+        with open( self.filename, 'r' ) as fp:
+          for line in fp:
+            try:
+              url, item, type = json.loads( line )
+            except ValueError:  # most likely the line being written when the last crawl died
+              continue
+
+            self.entry_map[ url ] = ( item, type )
+
+      except FileNotFoundError:
+        logging.warning( 'Checkpoint "{0}" not found, starting from the beginning'.format( self.filename ) )
+
+      logging.info( 'Resuming with {0} describes from checkpoint "{1}"'.format( len( self.entry_map ), self.filename ) )
+
+    self.fp = open( self.filename, 'a' if resume else 'w' )
+
+  def get( self, url ):
+    """
+    returns the checkpointed ( item, type ) for url, or None
+    """
+    return self.entry_map.get( url, None )
+
+  def put( self, url, item, type ):
+    if url in self.entry_map:
+      return
+
+    self.fp.write( json.dumps( [ url, item, type ], separators=( ',', ':' ) ) )
+    self.fp.write( '\n' )
+    self.fp.flush()
+
+  def close( self ):
+    self.fp.close()
+
+  def remove( self ):
+    self.close()
+    os.unlink( self.filename )
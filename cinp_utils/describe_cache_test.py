@@ -0,0 +1,61 @@
+import os
+
+from cinp_utils.describe_cache import DescribeCache
+from cinp_utils.codegen import crawl, render
+
+NAMESPACE_LIST = [ '/api/v1/', '/api/v1/Auth/' ]
+
+
+def test_describe_cache( cinp_server, tmp_path, read_output ):
+  cache_dir = str( tmp_path / 'cache' )
+  spec = crawl( cinp_server.endpoint, cache_dir=cache_dir )
+  describe_count = len( cinp_server.describe_list )
+  assert describe_count == len( cinp_server.tree )
+
+  cinp_server.describe_list.clear()
+  cached_spec = crawl( cinp_server.endpoint, cache_dir=cache_dir )
+  assert sorted( cinp_server.describe_list ) == NAMESPACE_LIST  # the api-versions are unchanged, everything else is from the cache
+  assert cached_spec[ 'root' ] == spec[ 'root' ]
+
+  render( spec, 'go', str( tmp_path / 'plain' ), 'test', timestamp='none' )
+  render( cached_spec, 'go', str( tmp_path / 'cached' ), 'test', timestamp='none' )
+  assert read_output( str( tmp_path / 'cached' ) ) == read_output( str( tmp_path / 'plain' ) )
+
+
+def test_api_version( cinp_server, tmp_path ):
+  cache_dir = str( tmp_path / 'cache' )
+  crawl( cinp_server.endpoint, cache_dir=cache_dir )
+
+  cinp_server.tree[ '/api/v1/Item' ][1][ 'doc' ] = 'Item doc v2'
+  cinp_server.tree[ '/api/v1/Auth/Group' ][1][ 'doc' ] = 'Group doc v2'
+  cinp_server.set_api_version( '2.0', '/api/v1/Auth/' )
+  cinp_server.describe_list.clear()
+  spec = crawl( cinp_server.endpoint, cache_dir=cache_dir )
+  assert sorted( cinp_server.describe_list ) == sorted( NAMESPACE_LIST + [ '/api/v1/Auth/User', '/api/v1/Auth/User(login)', '/api/v1/Auth/User(setGroup)', '/api/v1/Auth/Group' ] )
+
+  root = spec[ 'root' ]
+  assert root[ 'model_list' ][0][ 'doc' ] == 'Item doc'  # the root's api-version did not change, so its model is from the cache
+  assert root[ 'namespace_list' ][0][ 'api_version' ] == '2.0'
+  assert root[ 'namespace_list' ][0][ 'model_list' ][1][ 'doc' ] == 'Group doc v2'
+
+  assert crawl( cinp_server.endpoint )[ 'root' ][ 'namespace_list' ] == root[ 'namespace_list' ]
+
+
+def test_invalid( cinp_server, tmp_path ):
+  cache_dir = str( tmp_path / 'cache' )
+  crawl( cinp_server.endpoint, cache_dir=cache_dir )
+
+  cache = DescribeCache( cache_dir, 'http://127.0.0.2/api/v1/' )  # each endpoint has its own
+  assert cache.get( '/api/v1/' ) is None
+
+  cache = DescribeCache( cache_dir, cinp_server.endpoint )
+  assert cache.api_version( '/api/v1/' ) == '1.0'
+  assert cache.api_version( '/api/v1/Item' ) is None
+  with open( cache.filename, 'w' ) as fp:
+    fp.write( '{"version": 1, "endp' )
+
+  cinp_server.describe_list.clear()
+  crawl( cinp_server.endpoint, cache_dir=cache_dir )  # a corrupt cache is ignored
+  assert len( cinp_server.describe_list ) == len( cinp_server.tree )
+  assert os.listdir( cache_dir ) == [ os.path.basename( cache.filename ) ]
+  assert DescribeCache( cache_dir, cinp_server.endpoint ).api_version( '/api/v1/' ) == '1.0'
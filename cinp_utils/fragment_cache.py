@@ -0,0 +1,176 @@
+"""
+Rendered fragments cached on disk, shared by every render, of any service,
+that uses the same cache directory.  Fragments are content addressed, the
+key is the hash of everything that goes in to rendering one, the values the
+templates are rendered with (ie: the model's spec, with the ( path, name ) of
+the Models it refers to), the source of the backend module, which has the
+templates and filters, and the generator_hash of the shared code.  A cached
+fragment is used as is, without rendering its templates.
+
+Only the Models of the go, ts, rust and rst backends are cached.  A cache
+hit costs ~17-19us, a Namespace header renders in ~9-10us and a python
+Model in ~15us, so caching those would make renders slower, warm or cold.
+
+The cache is enabled by setting $CINP_CODEGEN_FRAGMENT_CACHE to the cache
+directory, $CINP_CODEGEN_FRAGMENT_CACHE_SIZE is the most MB it is evicted
+down to after each render, the least recently used fragments are removed
+first.
+"""
+import os
+import json
+import hashlib
+import logging
+
+from cinp_utils.records import as_dict
+from cinp_utils.source_hash import generator_hash, module_hash
+
+CACHE_DIR_ENV = 'CINP_CODEGEN_FRAGMENT_CACHE'
+CACHE_SIZE_ENV = 'CINP_CODEGEN_FRAGMENT_CACHE_SIZE'
+DEFAULT_CACHE_SIZE = 256  # MB
+
+
+class FragmentCache():
+  """
+  Fragments in cache_dir, each a JSON file named for its key in a sub
+  directory named for the first two characters of the key.  Getting a
+  fragment touches its file, so the mtimes order the fragments by when they
+  were last used.  Fragments are written to a temp file and moved in to
+  place, so renders in other processes never see a partial one.
+  """
+  def __init__( self, cache_dir, max_size, key_prefix=() ):
+    super().__init__()
+    self.cache_dir = cache_dir
+    self.max_size = max_size
+    self.key_prefix = [ generator_hash() ] + list( key_prefix )
+    self.dir_set = set()  # the sub directories known to exist
+
+  def key( self, *value_list ):
+    """
+    Returns the key of the fragment rendered from value_list, the values can
+    be records and the intermediate representation, the type_map memos are
+    left out, they are keyed by tuples.
+    """
+    return hashlib.sha1( json.dumps( self.key_prefix + list( value_list ), separators=( ',', ':' ), default=as_dict, skipkeys=True ).encode( 'utf-8' ) ).hexdigest()
+
+  def _filename( self, key ):
+    return os.path.join( self.cache_dir, key[ :2 ], '{0}.json'.format( key ) )
+
+  def get( self, key ):
+    """
+    returns the fragment for key, or None
+    """
+    filename = self._filename( key )
+    try:
+      with open( filename, 'r', encoding='utf-8' ) as fp:
+        fragment = json.load( fp )
+
+      os.utime( filename )
+
+    except FileNotFoundError:
+      return None
+
+    except ValueError as e:  # put replaces it
+      logging.warning( 'Ignoring corrupt fragment "{0}": {1}'.format( filename, e ) )
+      return None
+
+    return fragment
+
+  def put( self, key, fragment ):
+    filename = self._filename( key )
+    dir_name = os.path.dirname( filename )
+    if dir_name not in self.dir_set:
+      os.makedirs( dir_name, exist_ok=True )
+      self.dir_set.add( dir_name )
+
+    tmp_filename = '{0}.{1}.tmp'.format( filename, os.getpid() )
+    with open( tmp_filename, 'w', encoding='utf-8' ) as fp:
+      fp.write( json.dumps( fragment, separators=( ',', ':' ) ) )
+
+    os.replace( tmp_filename, filename )
+
+  def render( self, func, *value_list ):
+    """
+    Returns the fragment rendered from value_list, from the cache, or func(),
+    which is then cached.  The fragment has to be JSON serializable.
+    """
+    key = self.key( *value_list )
+    fragment = self.get( key )
+    if fragment is None:
+      fragment = func()
+      self.put( key, fragment )
+
+    return fragment
+
+  def evict( self ):
+    """
+    Remove the least recently used fragments until the cache is no larger
+    than max_size bytes, returns the number of fragments removed.
+    """
+    entry_list = []
+    total = 0
+    try:
+      dir_list = [ entry.path for entry in os.scandir( self.cache_dir ) if entry.is_dir() ]
+    except FileNotFoundError:
+      return 0
+
+    for dir_name in dir_list:
+      for entry in os.scandir( dir_name ):
+        try:
+          stat = entry.stat()
+        except FileNotFoundError:  # evicted by another process
+          continue
+
+        entry_list.append( ( stat.st_mtime, stat.st_size, entry.path ) )
+        total += stat.st_size
+
+    if total <= self.max_size:
+      return 0
+
+    count = 0
+    for _, size, filename in sorted( entry_list ):
+      try:
+        os.unlink( filename )
+      except FileNotFoundError:
+        pass
+
+      total -= size
+      count += 1
+      if total <= self.max_size:
+        break
+
+    logging.debug( 'Evicted {0} fragments from "{1}"'.format( count, self.cache_dir ) )
+    return count
+
+
+def get_fragment_cache( name=None, module_filename=None ):
+  """
+  Returns the FragmentCache from $CINP_CODEGEN_FRAGMENT_CACHE, or None if
+  it is not set.  The keys are prefixed with the backend name and the hash of
+  its module_filename.
+  """
+  cache_dir = os.environ.get( CACHE_DIR_ENV, None )
+  if not cache_dir:
+    return None
+
+  cache_size = os.environ.get( CACHE_SIZE_ENV, None ) or DEFAULT_CACHE_SIZE
+  try:
+    max_size = int( float( cache_size ) * 1024 * 1024 )
+  except ValueError:
+    raise ValueError( 'Invalid {0} "{1}"'.format( CACHE_SIZE_ENV, cache_size ) )
+
+  key_prefix = []
+  if name is not None:
+    key_prefix = [ name, module_hash( module_filename ) ]
+
+  return FragmentCache( cache_dir, max_size, key_prefix )
+
+
+def render_fragment( fragment_cache, func, *value_list ):
+  """
+  Returns fragment_cache.render( func, *value_list ), or func() if
+  fragment_cache is None.
+  """
+  if fragment_cache is None:
+    return func()
+
+  return fragment_cache.render( func, *value_list )
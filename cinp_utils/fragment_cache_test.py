@@ -0,0 +1,59 @@
+import os
+
+from cinp_utils.fragment_cache import CACHE_DIR_ENV, CACHE_SIZE_ENV, FragmentCache, get_fragment_cache
+from cinp_utils.codegen import crawl, render
+
+LANGUAGE_LIST = [ 'rst', 'go', 'ts', 'rust' ]
+
+
+def _fragment_list( cache_dir ):
+  return sorted( [ os.path.join( dir_name, filename ) for dir_name, _, filename_list in os.walk( cache_dir ) for filename in filename_list ] )
+
+
+def _render( spec, wrk_dir ):
+  for language in LANGUAGE_LIST:  # in this process, so they see the environment
+    render( spec, language, os.path.join( wrk_dir, language ), 'test', timestamp='none' )
+
+
+def test_fragment_cache( cinp_server, tmp_path, monkeypatch, read_output ):
+  cache_dir = str( tmp_path / 'cache' )
+  spec = crawl( cinp_server.endpoint )
+  _render( spec, str( tmp_path / 'plain' ) )
+
+  monkeypatch.setenv( CACHE_DIR_ENV, cache_dir )
+  _render( spec, str( tmp_path / 'cold' ) )
+  assert read_output( str( tmp_path / 'cold' ) ) == read_output( str( tmp_path / 'plain' ) )
+  fragment_list = _fragment_list( cache_dir )
+  assert fragment_list != []
+
+  with open( fragment_list[0], 'w' ) as fp:
+    fp.write( '{"trunc' )
+
+  _render( spec, str( tmp_path / 'warm' ) )
+  assert read_output( str( tmp_path / 'warm' ) ) == read_output( str( tmp_path / 'plain' ) )
+  assert _fragment_list( cache_dir ) == fragment_list  # the corrupt fragment was rendered again and replaced
+
+  cinp_server.tree[ '/api/v1/Auth/Group' ][1][ 'doc' ] = 'Group doc v2'
+  spec = crawl( cinp_server.endpoint )
+  _render( spec, str( tmp_path / 'changed' ) )
+  assert len( _fragment_list( cache_dir ) ) > len( fragment_list )
+
+  monkeypatch.delenv( CACHE_DIR_ENV )
+  _render( spec, str( tmp_path / 'plain_changed' ) )
+  assert read_output( str( tmp_path / 'changed' ) ) == read_output( str( tmp_path / 'plain_changed' ) )
+
+
+def test_evict( tmp_path, monkeypatch ):
+  cache = FragmentCache( str( tmp_path ), 0 )
+  for value in ( 'a', 'b', 'c' ):
+    assert cache.render( lambda: value.upper(), value ) == value.upper()
+
+  assert cache.render( lambda: 'not used', 'a' ) == 'A'
+  assert len( _fragment_list( str( tmp_path ) ) ) == 3
+  assert cache.evict() == 3
+  assert _fragment_list( str( tmp_path ) ) == []
+
+  monkeypatch.setenv( CACHE_DIR_ENV, str( tmp_path ) )
+  monkeypatch.setenv( CACHE_SIZE_ENV, '0.5' )
+  assert get_fragment_cache().max_size == 512 * 1024
+  assert get_fragment_cache( 'go', __file__ ).key( 'a' ) != get_fragment_cache( 'ts', __file__ ).key( 'a' )
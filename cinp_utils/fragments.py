@@ -0,0 +1,85 @@
+import math
+import shutil
+import logging
+import tempfile
+
+CHUNKS_PER_JOB = 4  # more chunks than jobs, so a few large namespaces do not leave the other jobs idle
+SPOOL_SIZE = 1024 * 1024
+
+
+def spool_file():
+  """
+  A text file for output that has to be written after what follows it, it
+  is kept in memory until it is larger than SPOOL_SIZE.
+  """
+  return tempfile.SpooledTemporaryFile( max_size=SPOOL_SIZE, mode='w+' )
+
+
+def copy_spool( spool, fp ):
+  spool.seek( 0 )
+  shutil.copyfileobj( spool, fp )
+
+
+def map_fragments( func, task_list, executor=None, jobs=1 ):
+  """
+  Render task_list with func, which takes a list of tasks and returns the
+  list of their fragments.  With an executor the tasks are split in to
+  chunks rendered in parallel, either way the fragments are returned in the
+  order of task_list.
+  """
+  if executor is None or jobs < 2:
+    return func( task_list )
+
+  chunk_size = max( 1, math.ceil( len( task_list ) / ( jobs * CHUNKS_PER_JOB ) ) )
+  result = []
+  for fragment_list in executor.map( func, [ task_list[ i:i + chunk_size ] for i in range( 0, len( task_list ), chunk_size ) ] ):
+    result += fragment_list
+
+  return result
+
+
+def update_fragments( func, task_list, key_list, fragment_map, dirty_set=None, executor=None, jobs=1 ):
+  """
+  Returns { key: fragment } for task_list, key_list is the key of each task.
+  The fragments in fragment_map of the keys not in dirty_set are reused,
+  the rest are rendered with func (see map_fragments), with dirty_set None
+  all are rendered.
+  """
+  result = {}
+  render_list = []
+  for index, key in enumerate( key_list ):
+    if dirty_set is None or key in dirty_set or key not in fragment_map:
+      render_list.append( index )
+    else:
+      result[ key ] = fragment_map[ key ]
+
+  logging.debug( 'Rendering {0} of {1} fragments'.format( len( render_list ), len( key_list ) ) )
+
+  for index, fragment in zip( render_list, map_fragments( func, [ task_list[ i ] for i in render_list ], executor, jobs ) ):
+    result[ key_list[ index ] ] = fragment
+
+  return result
+
+
+def nest_fragments( parent_list, head_list, tail_list ):
+  """
+  Join the fragments of ( parent index, namespace ) ordered namespaces, so
+  each namespace's head is followed by its children and then its tail.
+  """
+  child_map = {}
+  for index, parent in enumerate( parent_list ):
+    child_map.setdefault( parent, [] ).append( index )
+
+  result = []
+  stack = [ ( index, False ) for index in reversed( child_map.get( None, [] ) ) ]
+  while stack:
+    index, done = stack.pop()
+    if done:
+      result.append( tail_list[ index ] )
+      continue
+
+    result.append( head_list[ index ] )
+    stack.append( ( index, True ) )
+    stack += [ ( child, False ) for child in reversed( child_map.get( index, [] ) ) ]
+
+  return ''.join( result )
@@ -0,0 +1,83 @@
+import time
+import logging
+import threading
+
+LATENCY_FACTOR = 2.0  # latency this many times the baseline counts as the server struggling
+LATENCY_FLOOR = 0.01  # seconds, latency below this never counts as struggling
+SMOOTHING = 0.2
+BASELINE_DRIFT = 0.01  # lets the baseline follow a server that has become slower for good
+
+
+class Governor():
+  """
+  Limits the describe requests made by the crawl workers to max_rate requests
+  per second (None for no limit) and max_inflight requests at a time.
+
+  The limits adapt, additive increase/multiplicative decrease: a failed
+  request, or the smoothed latency rising past LATENCY_FACTOR times the best
+  latency seen, halves the in-flight limit (at most once per round trip), each
+  healthy response raises it by about one per round trip back up to
+  max_inflight.  The rate limit is scaled down along with the in-flight limit.
+  """
+  def __init__( self, max_inflight=1, max_rate=None ):
+    super().__init__()
+    self.max_inflight = max_inflight
+    self.max_rate = max_rate
+    self.limit = float( max_inflight )
+    self.inflight = 0
+    self.next_start = 0.0
+    self.baseline = None
+    self.latency = None
+    self.last_backoff = 0.0
+    self.condition = threading.Condition()
+
+  def acquire( self ):
+    """
+    Block until a request may be started.
+    """
+    with self.condition:
+      while self.inflight >= int( self.limit ):
+        self.condition.wait()
+
+      self.inflight += 1
+      delay = 0.0
+      if self.max_rate:
+        now = time.monotonic()
+        start = max( now, self.next_start )
+        self.next_start = start + 1.0 / ( self.max_rate * self.limit / self.max_inflight )
+        delay = start - now
+
+    if delay > 0:
+      time.sleep( delay )
+
+  def release( self, elapsed, ok ):
+    """
+    Report a request finished after elapsed seconds, ok is False if it failed.
+    """
+    with self.condition:
+      self.inflight -= 1
+
+      if ok:
+        if self.baseline is None or elapsed < self.baseline:
+          self.baseline = elapsed
+        else:
+          self.baseline += ( elapsed - self.baseline ) * BASELINE_DRIFT
+
+        if self.latency is None:
+          self.latency = elapsed
+        else:
+          self.latency += ( elapsed - self.latency ) * SMOOTHING
+
+      struggling = not ok or ( self.latency > LATENCY_FLOOR and self.latency > self.baseline * LATENCY_FACTOR )
+
+      now = time.monotonic()
+      if struggling:
+        if now - self.last_backoff > ( self.latency or elapsed ):
+          self.last_backoff = now
+          self.limit = max( 1.0, self.limit / 2.0 )
+          logging.debug( 'governor: backing off to {0} in flight, latency {1:.3f}s baseline {2:.3f}s ok {3}'.format( int( self.limit ), self.latency or 0.0, self.baseline or 0.0, ok ) )
+
+      elif self.limit < self.max_inflight:
+        self.limit = min( float( self.max_inflight ), self.limit + 1.0 / self.limit )
+
+      self.condition.notify_all()
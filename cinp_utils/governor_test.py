@@ -0,0 +1,66 @@
+import time
+import threading
+
+from cinp_utils.governor import Governor
+
+
+def test_backoff():
+  governor = Governor( 8 )
+  for _ in range( 8 ):
+    governor.acquire()
+
+  assert governor.inflight == 8
+  governor.release( 0.05, False )
+  assert int( governor.limit ) == 4
+  governor.release( 0.05, False )
+  assert int( governor.limit ) == 4  # at most once a round trip
+
+  for _ in range( 6 ):
+    governor.release( 0.05, True )
+
+  for _ in range( 100 ):
+    governor.acquire()
+    governor.release( 0.05, True )
+
+  assert governor.limit == 8.0  # back up to max_inflight
+
+
+def test_latency():
+  governor = Governor( 4 )
+  for _ in range( 10 ):
+    governor.acquire()
+    governor.release( 0.02, True )
+
+  assert governor.limit == 4.0
+  for _ in range( 10 ):
+    governor.acquire()
+    governor.release( 0.5, True )
+
+  assert governor.limit < 4.0  # the server slowed down
+
+
+def test_inflight():
+  governor = Governor( 1 )
+  governor.acquire()
+  acquired = threading.Event()
+
+  def _acquire():
+    governor.acquire()
+    acquired.set()
+
+  thread = threading.Thread( target=_acquire )
+  thread.start()
+  assert not acquired.wait( 0.1 )
+  governor.release( 0.01, True )
+  assert acquired.wait( 5 )
+  thread.join()
+
+
+def test_max_rate():
+  governor = Governor( 1, max_rate=20 )
+  start = time.monotonic()
+  for _ in range( 5 ):
+    governor.acquire()
+    governor.release( 0.001, True )
+
+  assert time.monotonic() - start >= 0.19
@@ -0,0 +1,157 @@
+"""
+Incremental rendering.  The spec of the last render is kept in the output
+directory as its index, the signature of each Namespace and Model by url,
+with the rendered fragments.  The next render diffs the index of its spec
+with that one and only renders what changed, the rest of the fragments are
+reused.  The renderers that support it have
+
+  render_incremental( root, fragment_map, dirty_set, executor, jobs )
+
+which renders the tree from root, reusing the fragments from fragment_map
+whose url is not in dirty_set (None when everything needs rendering) and
+returns the fragment map of this render, the fragments have to be JSON
+serializable.
+
+The kept state is only used if it was rendered by the same backend source
+and the same header, other than the timestamp.  Files that are not rendered
+again keep the timestamp of when they were.
+"""
+import os
+import gzip
+import json
+import hashlib
+
+from cinp_utils.ir import ensure_ir, iter_fields
+from cinp_utils.records import as_dict
+from cinp_utils.source_hash import module_hash
+
+STATE_FILENAME = '.cinp-codegen.state'
+
+
+def _signature( value ):  # what build_ir adds is derived from the spec, skipkeys leaves out the type_map memos, they are keyed by tuples
+  return hashlib.sha1( json.dumps( value, separators=( ',', ':' ), default=as_dict, skipkeys=True ).encode( 'utf-8' ) ).hexdigest()
+
+
+def spec_index( root ):
+  """
+  Returns the index of the tree from the intermediate representation root
+  for diff_index, it is kept with the fragments:
+
+    {
+      'namespace_map': { url: [ path, signature ] },
+      'model_map': { url: [ Namespace url, path, name, signature, [ uri of each Model field ] ] }
+    }
+
+  the signature of a Namespace is of what is rendered for it other than its
+  Models.
+  """
+  namespace_map = {}
+  model_map = {}
+  stack = [ ( root, [] ) ]
+  while stack:
+    namespace, path = stack.pop()
+    value = dict( [ ( key, value ) for key, value in namespace.items() if key not in ( 'model_list', 'namespace_list' ) ], model_list=[ model[ 'url' ] for model in namespace[ 'model_list' ] ] )
+    namespace_map[ namespace[ 'url' ] ] = [ path, _signature( value ) ]
+    for model in namespace[ 'model_list' ]:
+      model_map[ model[ 'url' ] ] = [ namespace[ 'url' ], path, model[ 'name' ], _signature( model ), [ field.get( 'uri', None ) for field in iter_fields( model ) if field[ 'type' ] == 'Model' ] ]
+
+    stack += [ ( child, path + [ child[ 'name' ] ] ) for child in namespace[ 'namespace_list' ] ]
+
+  return { 'namespace_map': namespace_map, 'model_map': model_map }
+
+
+def _reference( model_map, uri ):
+  try:
+    entry = model_map[ uri ]
+  except KeyError:
+    return None
+
+  return ( entry[1], entry[2] )
+
+
+def diff_index( old_index, index ):
+  """
+  Returns the set of urls of the Namespaces and Models in index (see
+  spec_index) that would render differently than they did for old_index.  A
+  Model changed if it, or its path did, or a Model it refers to was added,
+  removed, moved or renamed.  A Namespace changed if it, its path or list
+  of Models did, or any of its Models changed.
+  """
+  old_model_map = old_index[ 'model_map' ]
+  model_map = index[ 'model_map' ]
+
+  result = set()
+  for url, ( namespace_url, path, _, signature, uri_list ) in model_map.items():
+    old_entry = old_model_map.get( url, None )
+    if old_entry is None or old_entry[1] != path or old_entry[3] != signature or any( [ _reference( model_map, uri ) != _reference( old_model_map, uri ) for uri in uri_list ] ):
+      result.add( url )
+      result.add( namespace_url )
+
+  for url, entry in index[ 'namespace_map' ].items():
+    if entry != old_index[ 'namespace_map' ].get( url, None ):
+      result.add( url )
+
+  return result
+
+
+def load_state( wrk_dir, key ):
+  """
+  Returns ( index, fragment map ) of the last render kept in wrk_dir,
+  ( None, {} ) if there is none or it was rendered with another key.
+  """
+  try:
+    with gzip.open( os.path.join( wrk_dir, STATE_FILENAME ), 'rt', encoding='utf-8' ) as fp:
+      state = json.load( fp )
+
+  except ( OSError, EOFError, ValueError ):
+    return None, {}
+
+  if state.get( 'key' ) != key:
+    return None, {}
+
+  return state[ 'index' ], state[ 'fragment_map' ]
+
+
+def save_state( wrk_dir, key, index, fragment_map ):
+  """
+  Keep the index of the spec and fragment_map in wrk_dir for the next render.
+  """
+  filename = os.path.join( wrk_dir, STATE_FILENAME )
+  tmp_filename = '{0}.tmp'.format( filename )
+  with gzip.open( tmp_filename, 'wt', encoding='utf-8', compresslevel=6 ) as fp:
+    fp.write( json.dumps( { 'key': key, 'index': index, 'fragment_map': fragment_map }, separators=( ',', ':' ) ) )  # json.dump does not use the C encoder
+
+  os.replace( tmp_filename, filename )
+
+
+def remove_state( wrk_dir ):
+  """
+  Remove the state kept in wrk_dir, for renders that are not incremental, the
+  output no longer matches it.
+  """
+  try:
+    os.unlink( os.path.join( wrk_dir, STATE_FILENAME ) )
+  except FileNotFoundError:
+    pass
+
+
+def render_incremental( renderer, module_filename, root, executor=None, jobs=1 ):
+  """
+  Render the tree from root with renderer, only rendering what changed since
+  the last render into renderer.wrk_dir, module_filename is the source of
+  the renderer's backend.
+  """
+  header_map = renderer.header_map
+  key = { 'module': module_hash( module_filename ), 'header': dict( [ ( name, value ) for name, value in header_map.items() if name != 'timestamp' ] ) }
+
+  root = ensure_ir( root )
+  index = spec_index( root )
+
+  old_index, fragment_map = load_state( renderer.wrk_dir, key )
+  dirty_set = None
+  if old_index is not None:
+    dirty_set = diff_index( old_index, index )
+
+  fragment_map = renderer.render_incremental( root, fragment_map, dirty_set, executor, jobs )
+
+  save_state( renderer.wrk_dir, key, index, fragment_map )
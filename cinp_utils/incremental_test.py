@@ -0,0 +1,71 @@
+import os
+
+from cinp_utils.incremental import STATE_FILENAME
+from cinp_utils.codegen import crawl, render
+from conftest import field, model
+
+LANGUAGE_LIST = [ 'rst', 'python', 'go', 'ts', 'rust' ]
+
+
+def _output( read_output, wrk_dir ):
+  return dict( [ ( name, content ) for name, content in read_output( wrk_dir ).items() if os.path.basename( name ) != STATE_FILENAME ] )
+
+
+def _change_doc( tree ):
+  tree[ '/api/v1/Auth/Group' ][1][ 'doc' ] = 'Group doc v2'
+
+
+def _add_field( tree ):  # User refers to Group
+  tree[ '/api/v1/Auth/Group' ][1][ 'fields' ].append( field( 'email', 'String', length=100 ) )
+
+
+def _add_namespace( tree ):
+  tree[ '/api/v1/' ][1][ 'namespaces' ].append( '/api/v1/Extra/' )
+  tree[ '/api/v1/Extra/' ] = ( 'Namespace', { 'name': 'Extra', 'doc': 'Extra doc', 'path': '/api/v1/Extra/', 'api-version': '1.0', 'multi-uri-max': 100, 'namespaces': [], 'models': [ '/api/v1/Extra/Thing' ] } )
+  tree[ '/api/v1/Extra/Thing' ] = ( 'Model', model( 'Thing', '/api/v1/Extra/Thing', [ field( 'id', 'Integer', mode='RO' ), field( 'item', 'Model', uri='/api/v1/Item' ) ] ) )
+
+
+def _rename_model( tree ):  # Item is referred to by Thing
+  tree[ '/api/v1/Item' ][1][ 'name' ] = 'Entry'
+
+
+def _remove_model( tree ):
+  tree[ '/api/v1/Auth/' ][1][ 'models' ].remove( '/api/v1/Auth/Group' )
+  tree[ '/api/v1/Auth/User' ][1][ 'fields' ] = tree[ '/api/v1/Auth/User' ][1][ 'fields' ][ :3 ]
+  tree[ '/api/v1/Auth/User' ][1][ 'list-filters' ] = {}
+  tree[ '/api/v1/Auth/User' ][1][ 'query-filter-fields' ] = []
+  tree[ '/api/v1/Auth/User' ][1][ 'actions' ] = []
+
+
+def _api_version( tree ):
+  tree[ '/api/v1/' ][1][ 'api-version' ] = '2.0'
+
+
+def test_incremental( cinp_server, tmp_path, read_output ):
+  incremental_dir = str( tmp_path / 'incremental' )
+  render( crawl( cinp_server.endpoint ), LANGUAGE_LIST, incremental_dir, 'test', timestamp='none', incremental=True )
+  for language in LANGUAGE_LIST:
+    assert os.path.exists( os.path.join( incremental_dir, language, STATE_FILENAME ) )
+
+  for change in ( _change_doc, _add_field, _add_namespace, _rename_model, _remove_model, _api_version ):
+    change( cinp_server.tree )
+    spec = crawl( cinp_server.endpoint )
+    plain_dir = str( tmp_path / change.__name__ )
+    render( spec, LANGUAGE_LIST, plain_dir, 'test', timestamp='none' )
+    render( spec, LANGUAGE_LIST, incremental_dir, 'test', timestamp='none', incremental=True )
+    assert _output( read_output, incremental_dir ) == read_output( plain_dir ), change.__name__
+
+
+def test_remove_state( cinp_server, tmp_path, read_output ):
+  wrk_dir = str( tmp_path / 'output' )
+  spec = crawl( cinp_server.endpoint )
+  render( spec, 'go', wrk_dir, 'test', timestamp='none', incremental=True )
+  assert os.path.exists( os.path.join( wrk_dir, STATE_FILENAME ) )
+
+  _change_doc( cinp_server.tree )
+  render( crawl( cinp_server.endpoint ), 'go', wrk_dir, 'test', timestamp='none' )
+  assert not os.path.exists( os.path.join( wrk_dir, STATE_FILENAME ) )  # it would be out of date with the output
+
+  render( spec, 'go', wrk_dir, 'test', timestamp='none', incremental=True )
+  render( spec, 'go', str( tmp_path / 'plain' ), 'test', timestamp='none' )
+  assert _output( read_output, wrk_dir ) == read_output( str( tmp_path / 'plain' ) )
@@ -0,0 +1,156 @@
+"""
+The intermediate representation the renderers work from, built once from the
+crawled tree.  It is a copy of the tree of Namespace/Model dicts with what
+the renderers need resolved up front:
+
+  Namespace:
+    path - tuple of the Namespace names from the root down, () for the root
+
+  Model:
+    path - the path of its Namespace
+    id_field - the field named by id_field_name, None if there is none
+    constant_pair_map - constant_map with each constant as a list of
+                        ( value, label ) pairs
+
+  field (field_list, list_filter_map, query_filter_fields, action
+         paramater_list and return_type):
+    is_array - always set
+    model - ( path, name ) of the Model a Model field refers to, None if it
+            is not in the tree
+    type_map - the memo of the per language type strings, see memoize
+"""
+import copy
+import functools
+
+
+def _field( field, model_map ):
+  field[ 'is_array' ] = field.get( 'is_array', False )
+  field[ 'type_map' ] = {}
+  if field[ 'type' ] == 'Model':
+    field[ 'model' ] = model_map.get( field.get( 'uri', None ), None )
+
+
+def iter_fields( model ):
+  """
+  Yields all the fields of model, those of field_list, list_filter_map,
+  query_filter_fields and the return_type and paramater_list of the actions.
+  """
+  yield from model[ 'field_list' ]
+
+  for field_list in model[ 'list_filter_map' ].values():
+    yield from field_list
+
+  yield from model[ 'query_filter_fields' ]
+
+  for action in model[ 'action_list' ]:
+    if action.get( 'return_type', None ) is not None:
+      yield action[ 'return_type' ]
+
+    yield from action.get( 'paramater_list', [] )
+
+
+def _model( model, path, model_map ):
+  model[ 'path' ] = path
+
+  for field in iter_fields( model ):
+    _field( field, model_map )
+
+  model[ 'id_field' ] = None
+  for field in model[ 'field_list' ]:
+    if field[ 'name' ] == model[ 'id_field_name' ]:
+      model[ 'id_field' ] = field
+      break
+
+  model[ 'constant_pair_map' ] = {}
+  for name, item_list in model[ 'constant_map' ].items():
+    if item_list and isinstance( item_list[0], list ):
+      model[ 'constant_pair_map' ][ name ] = item_list
+    else:
+      model[ 'constant_pair_map' ][ name ] = list( zip( item_list, item_list ) )
+
+
+def build_ir( root ):
+  """
+  Returns the intermediate representation of the tree from root, root is
+  not modified.
+  """
+  root = copy.deepcopy( root )
+
+  namespace_list = []
+  model_map = {}
+  stack = [ ( root, () ) ]
+  while stack:
+    namespace, path = stack.pop()
+    namespace[ 'path' ] = path
+    namespace_list.append( namespace )
+    for model in namespace[ 'model_list' ]:
+      model_map[ model[ 'url' ] ] = ( path, model[ 'name' ] )
+
+    stack += [ ( child, path + ( child[ 'name' ], ) ) for child in namespace[ 'namespace_list' ] ]
+
+  for namespace in namespace_list:  # now all the models are known their references can be resolved
+    for model in namespace[ 'model_list' ]:
+      _model( model, namespace[ 'path' ], model_map )
+
+  return root
+
+
+def ensure_ir( root ):
+  """
+  Returns root if it is already the intermediate representation, otherwise
+  builds it.
+  """
+  if 'path' in root:
+    return root
+
+  return build_ir( root )
+
+
+def iter_ir( namespace_iter ):
+  """
+  The intermediate representation of ( parent index, namespace ) pairs as
+  they come from iter_crawl and spec.iter_spec.  Model references can not
+  be resolved without the whole tree, so model is None on all Model fields.
+  Namespaces that already are, ie: from spec.iter_tree of build_ir, are
+  passed through.
+  """
+  path_list = []
+  for parent, namespace in namespace_iter:
+    if 'path' in namespace:
+      path_list.append( namespace[ 'path' ] )
+      yield parent, namespace
+      continue
+
+    namespace = copy.deepcopy( namespace )
+    namespace[ 'path' ] = () if parent is None else path_list[ parent ] + ( namespace[ 'name' ], )
+    for model in namespace[ 'model_list' ]:
+      _model( model, namespace[ 'path' ], {} )
+
+    path_list.append( namespace[ 'path' ] )
+    yield parent, namespace
+
+
+def memoize( func ):
+  """
+  Memoize func( field, *args ) in the field's type_map, for the per language
+  type filters that are called for the same field by many templates.
+  """
+  key_prefix = ( func.__module__, func.__name__ )
+
+  @functools.wraps( func )
+  def wrapper( field, *args ):
+    type_map = field.get( 'type_map', None )
+    if type_map is None:
+      return func( field, *args )
+
+    key = key_prefix + args
+    try:
+      return type_map[ key ]
+    except KeyError:
+      pass
+
+    result = func( field, *args )
+    type_map[ key ] = result
+    return result
+
+  return wrapper
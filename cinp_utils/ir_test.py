@@ -0,0 +1,39 @@
+import os
+
+from cinp_utils.ir import build_ir, iter_fields
+from cinp_utils.codegen import crawl, render
+
+
+def _model( root, path, name ):
+  namespace = root
+  for namespace_name in path:
+    namespace = [ i for i in namespace[ 'namespace_list' ] if i[ 'name' ] == namespace_name ][0]
+
+  return [ i for i in namespace[ 'model_list' ] if i[ 'name' ] == name ][0]
+
+
+def test_query_filter_fields( cinp_server ):
+  spec = crawl( cinp_server.endpoint )
+  root = build_ir( spec[ 'root' ] )
+
+  user = _model( root, ( 'Auth', ), 'User' )
+  field_map = dict( [ ( field[ 'name' ], field ) for field in user[ 'query_filter_fields' ] ] )
+  assert field_map[ 'group' ][ 'model' ] == ( ( 'Auth', ), 'Group' )
+  assert field_map[ 'username' ][ 'type_map' ] == {}
+  assert field_map[ 'group' ] in list( iter_fields( user ) )
+
+  item = _model( root, (), 'Item' )
+  assert item[ 'query_filter_fields' ][0][ 'model' ] == ( ( 'Auth', ), 'User' )
+
+  assert 'model' not in _model( spec[ 'root' ], ( 'Auth', ), 'User' )[ 'query_filter_fields' ][1]  # the crawled tree is not modified
+
+
+def test_render_query_filter_model( cinp_server, tmp_path ):
+  spec = crawl( cinp_server.endpoint )
+  language_dir_map = render( spec, [ 'ts', 'rust' ], str( tmp_path ), 'test', timestamp='none' )
+
+  with open( os.path.join( language_dir_map[ 'ts' ], 'test.ts' ), 'r' ) as fp:
+    assert 'constructor( {  username, group  }: { username?: string, group?: Auth_Group } )' in fp.read()
+
+  with open( os.path.join( language_dir_map[ 'rust' ], 'test.rs' ), 'r' ) as fp:
+    assert 'group?: Auth_Group' in fp.read()
@@ -0,0 +1,72 @@
+import json
+
+
+def load_manifest( filename ):
+  """
+  Load a manifest of the services to generate, a JSON list of entries with
+  endpoint, service, language (a name, comma seperated names or a list of
+  names, default rst) and dir, optionally include and exclude pattern lists,
+  ie:
+
+  [
+    { "endpoint": "http://service/api/v1/", "service": "service", "language": [ "go", "ts" ], "dir": "gen/service" }
+  ]
+
+  Returns the list of entries with language, include and exclude as lists,
+  raises ValueError if the manifest is not valid.
+  """
+  with open( filename, 'r' ) as fp:
+    try:
+      entry_list = json.load( fp )
+    except ValueError as e:
+      raise ValueError( 'Unable to parse manifest "{0}": {1}'.format( filename, e ) )
+
+  if not isinstance( entry_list, list ):
+    raise ValueError( 'Manifest "{0}" must be a list of services'.format( filename ) )
+
+  result = []
+  service_dir_list = []
+  for index, entry in enumerate( entry_list ):
+    if not isinstance( entry, dict ):
+      raise ValueError( 'Manifest entry {0} must be an object'.format( index ) )
+
+    for name in ( 'endpoint', 'service', 'dir' ):
+      if not isinstance( entry.get( name, None ), str ) or not entry[ name ]:
+        raise ValueError( 'Manifest entry {0} is missing "{1}"'.format( index, name ) )
+
+    language_list = entry.get( 'language', 'rst' )
+    if isinstance( language_list, str ):
+      language_list = [ language_list ]
+
+    include_list = entry.get( 'include', [] )
+    exclude_list = entry.get( 'exclude', [] )
+    for name, value in ( ( 'language', language_list ), ( 'include', include_list ), ( 'exclude', exclude_list ) ):
+      if not isinstance( value, list ) or not all( isinstance( i, str ) for i in value ):
+        raise ValueError( 'Manifest entry {0} "{1}" must be a string or list of strings'.format( index, name ) )
+
+    if ( entry[ 'service' ], entry[ 'dir' ] ) in service_dir_list:
+      raise ValueError( 'Manifest entry {0} service "{1}" in "{2}" is listed more than once'.format( index, entry[ 'service' ], entry[ 'dir' ] ) )
+
+    service_dir_list.append( ( entry[ 'service' ], entry[ 'dir' ] ) )
+
+    result.append( {
+                     'endpoint': entry[ 'endpoint' ],
+                     'service': entry[ 'service' ],
+                     'language': language_list,
+                     'dir': entry[ 'dir' ],
+                     'include': include_list,
+                     'exclude': exclude_list
+                   } )
+
+  return result
+
+
+def format_manifest_report( result_list ):
+  success_count = len( [ i for i in result_list if i[ 'success' ] ] )
+  result = 'Manifest Report: {0} of {1} services generated\n'.format( success_count, len( result_list ) )
+  for item in result_list:
+    result += '  {0:<5} {1:<20} crawl: {2:.3f}s  render: {3:.3f}s  {4}\n'.format( 'ok' if item[ 'success' ] else 'FAIL', item[ 'service' ], item[ 'crawl_time' ], item[ 'render_time' ], item[ 'endpoint' ] )
+    if item[ 'error' ] is not None:
+      result += '        {0}\n'.format( item[ 'error' ] )
+
+  return result
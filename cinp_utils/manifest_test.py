@@ -0,0 +1,42 @@
+import json
+
+import pytest
+
+from cinp_utils.manifest import load_manifest
+from cinp_utils.codegen import crawl, render, generate_manifest
+
+
+def _write( tmp_path, value ):
+  filename = str( tmp_path / 'manifest.json' )
+  with open( filename, 'w' ) as fp:
+    fp.write( json.dumps( value ) )
+
+  return filename
+
+
+def test_load_manifest( tmp_path ):
+  entry_list = load_manifest( _write( tmp_path, [ { 'endpoint': 'http://test/api/v1/', 'service': 'test', 'language': 'go', 'dir': 'gen' } ] ) )
+  assert entry_list == [ { 'endpoint': 'http://test/api/v1/', 'service': 'test', 'language': [ 'go' ], 'dir': 'gen', 'include': [], 'exclude': [] } ]
+
+  for value in ( {}, [ 'test' ], [ { 'endpoint': 'http://test/api/v1/', 'dir': 'gen' } ], [ { 'endpoint': 'http://test/api/v1/', 'service': 'test', 'dir': 'gen', 'include': 'Auth' } ],
+                 [ { 'endpoint': 'http://test/api/v1/', 'service': 'test', 'dir': 'gen' } ] * 2 ):
+    with pytest.raises( ValueError ):
+      load_manifest( _write( tmp_path, value ) )
+
+
+def test_generate_manifest( cinp_server, tmp_path, monkeypatch, read_output ):
+  monkeypatch.setenv( 'SOURCE_DATE_EPOCH', '1600000000' )
+  manifest = [
+               { 'endpoint': cinp_server.endpoint, 'service': 'test', 'language': [ 'go', 'rst' ], 'dir': str( tmp_path / 'test' ) },
+               { 'endpoint': cinp_server.endpoint, 'service': 'auth', 'language': 'go', 'dir': str( tmp_path / 'auth' ), 'include': [ 'Auth' ] },
+               { 'endpoint': cinp_server.endpoint.replace( '/api/v1/', '/api/v2/' ), 'service': 'missing', 'dir': str( tmp_path / 'missing' ) }
+             ]
+  entry_list = load_manifest( _write( tmp_path, manifest ) )
+  result_list = generate_manifest( entry_list, manifest_jobs=2, jobs=2 )
+  assert [ ( result[ 'service' ], result[ 'success' ] ) for result in result_list ] == [ ( 'test', True ), ( 'auth', True ), ( 'missing', False ) ]
+
+  render( crawl( cinp_server.endpoint ), [ 'go', 'rst' ], str( tmp_path / 'plain' ), 'test' )
+  assert read_output( str( tmp_path / 'test' ) ) == read_output( str( tmp_path / 'plain' ) )
+
+  render( crawl( cinp_server.endpoint, include=[ 'Auth' ] ), 'go', str( tmp_path / 'plain_auth' ), 'auth' )
+  assert read_output( str( tmp_path / 'auth' ) ) == read_output( str( tmp_path / 'plain_auth' ) )
@@ -0,0 +1,112 @@
+import copy
+from fnmatch import fnmatchcase
+
+
+class PathFilter():
+  """
+  Selects which Namespaces and Models are crawled and rendered.
+
+  Paths are urls relative to the root Namespace, for a root of /api/v1/ the
+  Namespace /api/v1/Auth/ is "Auth" and the Model /api/v1/Auth/User is
+  "Auth/User".  Patterns are shell globs matched a segment at a time, a
+  pattern matching a Namespace also matches everything under it, so "Auth"
+  and "Auth/*" both select all of Auth.  With no include patterns everything
+  that is not excluded is selected.
+  """
+  def __init__( self, root_path, include_list=None, exclude_list=None ):
+    super().__init__()
+    self.root_path = root_path
+    self.include_list = [ i.strip( '/' ).split( '/' ) for i in include_list or [] ]
+    self.exclude_list = [ i.strip( '/' ).split( '/' ) for i in exclude_list or [] ]
+
+  def _segment_list( self, url ):
+    if not url.startswith( self.root_path ):
+      return None
+
+    path = url[ len( self.root_path ): ].strip( '/' )
+    if not path:
+      return []
+
+    return path.split( '/' )
+
+  def _match( self, pattern_list, segment_list ):  # the pattern matches the path or one of its parents
+    for pattern in pattern_list:
+      if len( pattern ) <= len( segment_list ) and all( fnmatchcase( segment, part ) for segment, part in zip( segment_list, pattern ) ):
+        return True
+
+    return False
+
+  def _parent_of_match( self, segment_list ):  # the path is a parent of something an include pattern could match
+    for pattern in self.include_list:
+      if len( pattern ) > len( segment_list ) and all( fnmatchcase( segment, part ) for segment, part in zip( segment_list, pattern ) ):
+        return True
+
+    return False
+
+  def want_namespace( self, url ):
+    segment_list = self._segment_list( url )
+    if segment_list is None:
+      return False
+
+    if not segment_list:  # the root is always needed
+      return True
+
+    if self._match( self.exclude_list, segment_list ):
+      return False
+
+    return not self.include_list or self._match( self.include_list, segment_list ) or self._parent_of_match( segment_list )
+
+  def want_model( self, url ):
+    segment_list = self._segment_list( url )
+    if segment_list is None:
+      return False
+
+    if self._match( self.exclude_list, segment_list ):
+      return False
+
+    return not self.include_list or self._match( self.include_list, segment_list )
+
+  def _resolve( self, field ):
+    if field is None or field.get( 'type', None ) != 'Model' or self.want_model( field.get( 'uri', '' ) ):
+      return field
+
+    result = copy.copy( field )
+    result[ 'type' ] = 'String'  # the client gets the URI of the model as a plain string
+    return result
+
+  def _resolve_model( self, model ):
+    result = copy.copy( model )
+    result[ 'field_list' ] = [ self._resolve( i ) for i in model[ 'field_list' ] ]
+    result[ 'list_filter_map' ] = dict( [ ( name, [ self._resolve( i ) for i in paramater_list ] ) for name, paramater_list in model[ 'list_filter_map' ].items() ] )
+    result[ 'query_filter_fields' ] = [ self._resolve( i ) for i in model[ 'query_filter_fields' ] ]
+    result[ 'action_list' ] = []
+    for action in model[ 'action_list' ]:
+      action = copy.copy( action )
+      action[ 'return_type' ] = self._resolve( action[ 'return_type' ] )
+      action[ 'paramater_list' ] = [ self._resolve( i ) for i in action[ 'paramater_list' ] ]
+      result[ 'action_list' ].append( action )
+
+    return result
+
+  def filter_iter( self, namespace_iter ):
+    """
+    Filter ( parent index, namespace ) pairs as produced by Crawler.walk and
+    iter_spec, dropping unwanted Namespaces (and everything under them) and
+    Models, re-numbering the parent indexes to match.  References to Models
+    that are filtered out are turned into String fields holding the URI.
+    """
+    index_map = {}
+    counter = 0
+    for index, ( parent, namespace ) in enumerate( namespace_iter ):
+      if parent is not None:
+        if parent not in index_map or not self.want_namespace( namespace[ 'url' ] ):
+          continue
+
+        parent = index_map[ parent ]
+
+      index_map[ index ] = counter
+      counter += 1
+
+      namespace = copy.copy( namespace )
+      namespace[ 'model_list' ] = [ self._resolve_model( model ) for model in namespace[ 'model_list' ] if self.want_model( model[ 'url' ] ) ]
+      yield parent, namespace
@@ -0,0 +1,41 @@
+from cinp_utils.path_filter import PathFilter
+from cinp_utils.ir import build_ir
+from cinp_utils.codegen import crawl, render
+
+
+def test_want():
+  path_filter = PathFilter( '/api/v1/', [ 'Auth/*' ], [ 'Auth/G*' ] )
+  assert path_filter.want_namespace( '/api/v1/' )
+  assert path_filter.want_namespace( '/api/v1/Auth/' )
+  assert not path_filter.want_namespace( '/api/v2/Auth/' )
+  assert path_filter.want_model( '/api/v1/Auth/User' )
+  assert not path_filter.want_model( '/api/v1/Auth/Group' )
+  assert not path_filter.want_model( '/api/v1/Item' )
+
+  path_filter = PathFilter( '/api/v1/', exclude_list=[ 'Auth' ] )
+  assert not path_filter.want_namespace( '/api/v1/Auth/' )
+  assert not path_filter.want_model( '/api/v1/Auth/User' )
+  assert path_filter.want_model( '/api/v1/Item' )
+
+
+def test_exclude( cinp_server, tmp_path ):
+  spec = crawl( cinp_server.endpoint, exclude=[ 'Auth/Group' ] )
+  assert '/api/v1/Auth/Group' not in cinp_server.describe_list
+
+  auth = build_ir( spec[ 'root' ] )[ 'namespace_list' ][0]
+  assert [ model[ 'name' ] for model in auth[ 'model_list' ] ] == [ 'User' ]
+  user = auth[ 'model_list' ][0]
+  assert [ ( field[ 'name' ], field[ 'type' ] ) for field in user[ 'query_filter_fields' ] ] == [ ( 'username', 'String' ), ( 'group', 'String' ) ]  # references to Group are left as its URI
+  assert user[ 'field_list' ][3][ 'type' ] == 'String'
+  assert user[ 'action_list' ][1][ 'paramater_list' ][0][ 'type' ] == 'String'
+
+  render( spec, [ 'ts', 'rust', 'go' ], str( tmp_path ), 'test', timestamp='none' )
+
+
+def test_include( cinp_server ):
+  spec = crawl( cinp_server.endpoint, include=[ 'Item' ] )
+  assert sorted( cinp_server.describe_list ) == [ '/api/v1/', '/api/v1/Item' ]
+
+  root = spec[ 'root' ]
+  assert root[ 'namespace_list' ] == []
+  assert root[ 'model_list' ][0][ 'field_list' ][1][ 'type' ] == 'String'
@@ -0,0 +1,187 @@
+"""
+Compact records for the crawled spec.  Large APIs have thousands of fields
+that as dicts each repeat the same keys and mostly the same strings, the
+records keep their values in __slots__ and the strings interned.
+
+The records are MutableMappings, so they are used just like the dicts they
+replace, record[ 'name' ], record.get( 'uri', '' ), dict( record ) and in
+the templates field.name all work.  A slot that was never set is a missing
+key, keys that are not slots, ie: new ones from a newer server, are kept in
+extra_map.  Constructing a record from a mapping converts the nested
+values, ie: Model( item ) makes the field_list Fields.
+"""
+import sys
+import copy
+from collections.abc import MutableMapping
+
+_ATOMIC_TYPES = ( str, int, float, bool, type( None ) )  # immutable, deepcopy returns them as is
+_MISSING = object()  # getattr default for a slot that was never set, cheaper than catching the AttributeError
+
+
+def _intern( value ):
+  if isinstance( value, str ):
+    return sys.intern( value )
+
+  if isinstance( value, list ):
+    return [ _intern( i ) for i in value ]
+
+  if isinstance( value, dict ):
+    return dict( [ ( _intern( key ), _intern( item ) ) for key, item in value.items() ] )
+
+  return value
+
+
+class Record( MutableMapping ):
+  __slots__ = ( 'extra_map', )
+  key_list = ()  # the slots of the record in order, set by __init_subclass__
+  convert_map = {}  # key -> function to convert the value with when the record is constructed
+
+  def __init_subclass__( cls, **kwargs ):
+    super().__init_subclass__( **kwargs )
+    key_list = []
+    for klass in reversed( cls.__mro__ ):
+      key_list += [ i for i in klass.__dict__.get( '__slots__', () ) if i != 'extra_map' ]
+
+    cls.key_list = tuple( key_list )
+    cls.key_set = frozenset( key_list )
+
+  def __init__( self, value=None ):
+    super().__init__()
+    self.extra_map = None
+    for key, item in ( value or {} ).items():
+      self[ key ] = self.convert_map.get( key, _intern )( item )
+
+  def __getitem__( self, key ):
+    if key in self.key_set:
+      try:
+        return getattr( self, key )
+      except AttributeError:
+        raise KeyError( key )
+
+    if self.extra_map is None:
+      raise KeyError( key )
+
+    return self.extra_map[ key ]
+
+  def __setitem__( self, key, value ):
+    if key in self.key_set:
+      setattr( self, key, value )
+      return
+
+    if self.extra_map is None:
+      self.extra_map = {}
+
+    self.extra_map[ sys.intern( key ) ] = value
+
+  def __delitem__( self, key ):
+    if key in self.key_set:
+      try:
+        delattr( self, key )
+      except AttributeError:
+        raise KeyError( key )
+
+      return
+
+    if self.extra_map is None:
+      raise KeyError( key )
+
+    del self.extra_map[ key ]
+
+  def __iter__( self ):
+    for key in self.key_list:
+      if hasattr( self, key ):
+        yield key
+
+    if self.extra_map is not None:
+      yield from self.extra_map
+
+  def __len__( self ):
+    return len( list( iter( self ) ) )
+
+  def __copy__( self ):
+    result = self.__class__.__new__( self.__class__ )
+    for key in self.key_list:
+      try:
+        setattr( result, key, getattr( self, key ) )
+      except AttributeError:
+        pass
+
+    result.extra_map = None if self.extra_map is None else dict( self.extra_map )
+    return result
+
+  def __deepcopy__( self, memo ):
+    result = self.__class__.__new__( self.__class__ )
+    memo[ id( self ) ] = result
+    for key in self.key_list:
+      try:
+        value = getattr( self, key )
+      except AttributeError:
+        continue
+
+      setattr( result, key, value if isinstance( value, _ATOMIC_TYPES ) else copy.deepcopy( value, memo ) )
+
+    result.extra_map = copy.deepcopy( self.extra_map, memo )
+    return result
+
+  def __repr__( self ):
+    return '{0}({1})'.format( self.__class__.__name__, dict( self ) )
+
+
+def as_dict( value ):
+  """
+  Returns the Record value as a dict, for the default of json.dumps, it is
+  a good deal faster than dict( value ).
+  """
+  if not isinstance( value, Record ):
+    raise TypeError( 'Object of type {0} is not JSON serializable'.format( value.__class__.__name__ ) )
+
+  result = {}
+  for key in value.key_list:
+    item = getattr( value, key, _MISSING )
+    if item is not _MISSING:
+      result[ key ] = item
+
+  if value.extra_map is not None:
+    result.update( value.extra_map )
+
+  return result
+
+
+def _record_list( cls ):
+  return lambda value_list: [ cls( i ) for i in value_list ]
+
+
+class Field( Record ):
+  __slots__ = ( 'name', 'type', 'mode', 'required', 'is_array', 'default', 'doc', 'length', 'uri', 'choice_list', 'allowed_scheme_list', 'model', 'type_map' )  # model and type_map are set by ir.build_ir
+
+
+class Paramater( Field ):
+  __slots__ = ()
+
+
+class Action( Record ):
+  __slots__ = ( 'name', 'url', 'doc', 'static', 'return_type', 'paramater_list' )
+  convert_map = {
+                  'return_type': lambda value: None if value is None else Field( value ),
+                  'paramater_list': _record_list( Paramater )
+                }
+
+
+class Model( Record ):
+  __slots__ = ( 'name', 'url', 'doc', 'constant_map', 'list_filter_map', 'field_list', 'not_allowed_verb_list', 'query_filter_fields', 'query_sort_fields', 'id_field_name', 'action_list', 'path', 'id_field', 'constant_pair_map' )  # path, id_field and constant_pair_map are set by ir.build_ir
+  convert_map = {
+                  'field_list': _record_list( Field ),
+                  'list_filter_map': lambda value: dict( [ ( sys.intern( name ), [ Paramater( i ) for i in paramater_list ] ) for name, paramater_list in value.items() ] ),
+                  'action_list': _record_list( Action )
+                }
+
+
+class Namespace( Record ):
+  __slots__ = ( 'name', 'url', 'doc', 'api_version', 'model_list', 'namespace_list', 'path' )  # path is set by ir.build_ir
+  convert_map = {}  # set below, namespace_list needs Namespace
+
+
+Namespace.convert_map = {
+                          'model_list': _record_list( Model ),
+                          'namespace_list': _record_list( Namespace )
+                        }
@@ -0,0 +1,52 @@
+import copy
+import json
+
+import pytest
+
+from cinp_utils.records import Model, Field, Action, as_dict
+from cinp_utils.crawler import model_entry
+from conftest import build_tree
+
+
+def test_record():
+  field = Field( { 'name': 'username', 'type': 'String', 'new-key': 1 } )
+  assert field[ 'name' ] == 'username'
+  assert field.get( 'uri', '' ) == ''
+  assert 'uri' not in field
+  assert list( field ) == [ 'name', 'type', 'new-key' ]
+  assert dict( field ) == { 'name': 'username', 'type': 'String', 'new-key': 1 }
+  assert len( field ) == 3
+
+  field[ 'uri' ] = '/api/v1/Auth/User'
+  del field[ 'new-key' ]
+  assert dict( field ) == { 'name': 'username', 'type': 'String', 'uri': '/api/v1/Auth/User' }
+  with pytest.raises( KeyError ):
+    del field[ 'length' ]
+
+  with pytest.raises( KeyError ):
+    field[ 'other' ]
+
+
+def test_model():
+  tree = build_tree()
+  item = tree[ '/api/v1/Auth/User' ][1]
+  model = model_entry( '/api/v1/Auth/User', item )
+  assert isinstance( model, Model )
+  assert isinstance( model[ 'field_list' ][0], Field )
+  assert isinstance( model[ 'list_filter_map' ][ 'group' ][0], Field )
+
+  model[ 'action_list' ].append( Action( { 'name': 'login', 'return_type': item[ 'fields' ][1], 'paramater_list': [] } ) )
+  assert isinstance( model[ 'action_list' ][0][ 'return_type' ], Field )
+
+  deep = copy.deepcopy( model )
+  deep[ 'field_list' ][0][ 'name' ] = 'changed'
+  assert model[ 'field_list' ][0][ 'name' ] == 'id'
+
+  shallow = copy.copy( model )
+  shallow[ 'name' ] = 'changed'
+  assert model[ 'name' ] == 'User'
+  assert shallow[ 'field_list' ] is model[ 'field_list' ]
+
+  assert json.loads( json.dumps( model, default=as_dict ) ) == json.loads( json.dumps( dict( model ), default=dict ) )
+  with pytest.raises( TypeError ):
+    as_dict( object() )
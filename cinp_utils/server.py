@@ -0,0 +1,268 @@
+import io
+import json
+import shutil
+import tarfile
+import logging
+import tempfile
+import threading
+import urllib.parse
+import multiprocessing
+from contextlib import contextmanager
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from concurrent.futures import ProcessPoolExecutor
+
+from cinp_utils.codegen import get_host, get_transport, get_language_dir_map, crawl, render
+from cinp_utils.governor import Governor
+
+
+class LRUCache():
+  """
+  Keeps the max_size most recently used entries.
+  """
+  def __init__( self, max_size ):
+    super().__init__()
+    self.max_size = max_size
+    self.lock = threading.Lock()
+    self.entry_map = OrderedDict()
+    self.hit_count = 0
+    self.miss_count = 0
+
+  def get( self, key ):
+    with self.lock:
+      try:
+        value = self.entry_map[ key ]
+      except KeyError:
+        self.miss_count += 1
+        return None
+
+      self.entry_map.move_to_end( key )
+      self.hit_count += 1
+      return value
+
+  def put( self, key, value ):
+    with self.lock:
+      self.entry_map[ key ] = value
+      self.entry_map.move_to_end( key )
+      while len( self.entry_map ) > self.max_size:
+        self.entry_map.popitem( last=False )
+
+  def stats( self ):
+    with self.lock:
+      return { 'size': len( self.entry_map ), 'max_size': self.max_size, 'hits': self.hit_count, 'misses': self.miss_count }
+
+
+class CodegenService():
+  """
+  Generates clients on request, crawled specs and the rendered output
+  (as .tar.gz) are kept in LRU caches keyed by the api-version of the
+  endpoint, so a request for an unchanged API costs one describe of the root
+  Namespace.  Requests for the same output wait on the first one instead of
+  crawling and rendering it again.
+
+  Renders run in a process pool, started with spawn as the server is threaded.
+  """
+  def __init__( self, cache_size=32, render_jobs=None, allowed_endpoint_list=None, proxy=None, keep_alive=False, jobs=1, max_rate=None, **kwargs ):
+    super().__init__()
+    self.spec_cache = LRUCache( cache_size )
+    self.output_cache = LRUCache( cache_size )
+    self.allowed_endpoint_list = allowed_endpoint_list
+    self.proxy = proxy
+    self.keep_alive = keep_alive
+    self.jobs = jobs
+    self.max_rate = max_rate
+    self.crawl_kwargs = kwargs
+    self.lock = threading.Lock()
+    self.host_map = {}
+    self.key_lock_map = {}  # key: ( lock, number of holders and waiters )
+    self.render_executor = ProcessPoolExecutor( max_workers=render_jobs, mp_context=multiprocessing.get_context( 'spawn' ) )
+
+  def close( self ):
+    self.render_executor.shutdown()
+
+  def _host( self, endpoint ):
+    host = get_host( urllib.parse.urlparse( endpoint ) )
+    with self.lock:
+      try:
+        return self.host_map[ host ]
+      except KeyError:
+        pass
+
+      result = ( get_transport( endpoint, self.proxy, True ) if self.keep_alive else None, Governor( self.jobs, self.max_rate ) )
+      self.host_map[ host ] = result
+      return result
+
+  @contextmanager
+  def _key_lock( self, key ):
+    """
+    Hold the lock of key, requests for the same key wait on each other.  The
+    lock is removed once nothing holds or waits on it, so there is only one
+    for each key in progress.
+    """
+    with self.lock:
+      lock, count = self.key_lock_map.get( key, ( None, 0 ) )
+      if lock is None:
+        lock = threading.Lock()
+
+      self.key_lock_map[ key ] = ( lock, count + 1 )
+
+    try:
+      with lock:
+        yield
+
+    finally:
+      with self.lock:
+        lock, count = self.key_lock_map[ key ]
+        if count == 1:
+          del self.key_lock_map[ key ]
+        else:
+          self.key_lock_map[ key ] = ( lock, count - 1 )
+
+  def check_endpoint( self, endpoint ):
+    url = urllib.parse.urlparse( endpoint )
+    if url.scheme not in ( 'http', 'https' ) or not url.hostname:
+      raise ValueError( 'Invalid endpoint "{0}"'.format( endpoint ) )
+
+    if self.allowed_endpoint_list is not None and not any( [ endpoint.startswith( i ) for i in self.allowed_endpoint_list ] ):
+      raise ValueError( 'Endpoint "{0}" is not allowed'.format( endpoint ) )
+
+  def api_version( self, endpoint ):
+    cinp, _ = self._host( endpoint )
+    if cinp is None:
+      cinp = get_transport( endpoint, self.proxy, False )
+
+    item, type = cinp.describe( urllib.parse.urlparse( endpoint ).path )
+    if type != 'Namespace':
+      raise ValueError( 'Expected Namespace got "{0}"'.format( type ) )
+
+    return item[ 'api-version' ]
+
+  def get_spec( self, endpoint, api_version ):
+    key = ( endpoint, api_version )
+    spec = self.spec_cache.get( key )
+    if spec is not None:
+      return spec
+
+    with self._key_lock( key ):
+      spec = self.spec_cache.get( key )
+      if spec is None:
+        cinp, governor = self._host( endpoint )
+        spec = crawl( endpoint, proxy=self.proxy, keep_alive=self.keep_alive, jobs=self.jobs, cinp=cinp, governor=governor, **self.crawl_kwargs )
+        self.spec_cache.put( key, spec )
+
+    return spec
+
+  def get_output( self, endpoint, service, language ):
+    """
+    Returns ( api version, .tar.gz of the output, True if it was cached ),
+    language is as for codegen.get_language_dir_map.
+    """
+    self.check_endpoint( endpoint )
+    language_list = sorted( get_language_dir_map( language, '' ) )
+
+    api_version = self.api_version( endpoint )
+    key = ( endpoint, api_version, service, tuple( language_list ) )
+    output = self.output_cache.get( key )
+    if output is not None:
+      return api_version, output, True
+
+    with self._key_lock( key ):
+      output = self.output_cache.get( key )
+      if output is not None:
+        return api_version, output, True
+
+      spec = self.get_spec( endpoint, api_version )
+      wrk_dir = tempfile.mkdtemp( prefix='cinp-codegen-' )
+      try:
+        render( spec, language_list, wrk_dir, service, self.render_executor )
+        buff = io.BytesIO()
+        with tarfile.open( fileobj=buff, mode='w:gz' ) as tar:
+          tar.add( wrk_dir, arcname=service )
+
+        output = buff.getvalue()
+
+      finally:
+        shutil.rmtree( wrk_dir, ignore_errors=True )
+
+      self.output_cache.put( key, output )
+
+    return api_version, output, False
+
+  def stats( self ):
+    return { 'spec_cache': self.spec_cache.stats(), 'output_cache': self.output_cache.stats() }
+
+
+class CodegenRequestHandler( BaseHTTPRequestHandler ):
+  """
+  GET /generate?endpoint=<CInP endpoint>&service=<name>&language=<language>
+    returns the generated output as a .tar.gz, language can be repeated or
+    comma seperated, each language is then in a sub directory
+
+  GET /stats
+    returns the cache statistics as JSON
+  """
+  server_version = 'cinp-codegen'
+
+  def log_message( self, format, *args ):
+    logging.info( 'cinp-codegen serve: {0} - {1}'.format( self.address_string(), format % args ) )
+
+  def _send( self, code, body, content_type, header_map=None ):
+    self.send_response( code )
+    self.send_header( 'Content-Type', content_type )
+    self.send_header( 'Content-Length', str( len( body ) ) )
+    for name, value in ( header_map or {} ).items():
+      self.send_header( name, value )
+
+    self.end_headers()
+    self.wfile.write( body )
+
+  def _send_json( self, code, value ):
+    self._send( code, json.dumps( value ).encode( 'utf-8' ), 'application/json' )
+
+  def do_GET( self ):
+    url = urllib.parse.urlparse( self.path )
+    if url.path == '/stats':
+      self._send_json( 200, self.server.codegen.stats() )
+      return
+
+    if url.path != '/generate':
+      self._send_json( 404, { 'message': 'Not Found' } )
+      return
+
+    query_map = urllib.parse.parse_qs( url.query )
+    try:
+      endpoint = query_map[ 'endpoint' ][0]
+      service = query_map[ 'service' ][0]
+    except KeyError:
+      self._send_json( 400, { 'message': 'endpoint and service are required' } )
+      return
+
+    if not service.isidentifier():
+      self._send_json( 400, { 'message': 'Invalid service name "{0}"'.format( service ) } )
+      return
+
+    language = query_map.get( 'language', [ 'rst' ] )
+    try:
+      get_language_dir_map( language, '' )
+      self.server.codegen.check_endpoint( endpoint )
+    except ValueError as e:
+      self._send_json( 400, { 'message': str( e ) } )
+      return
+
+    try:
+      api_version, output, cached = self.server.codegen.get_output( endpoint, service, language )
+    except Exception as e:
+      logging.exception( 'Error generating "{0}" from "{1}"'.format( service, endpoint ) )
+      self._send_json( 502, { 'message': 'Error generating from "{0}": {1}'.format( endpoint, e ) } )
+      return
+
+    self._send( 200, output, 'application/gzip', { 'Content-Disposition': 'attachment; filename="{0}.tar.gz"'.format( service ), 'X-API-Version': api_version, 'X-Cache': 'hit' if cached else 'miss' } )
+
+
+class CodegenServer( ThreadingMixIn, HTTPServer ):
+  daemon_threads = True
+
+  def __init__( self, address, codegen ):
+    super().__init__( address, CodegenRequestHandler )
+    self.codegen = codegen
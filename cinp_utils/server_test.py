@@ -0,0 +1,109 @@
+import io
+import json
+import tarfile
+import threading
+import urllib.parse
+import http.client
+
+import pytest
+
+from cinp_utils.server import CodegenService, CodegenServer
+from cinp_utils.codegen import crawl, render
+
+
+@pytest.fixture
+def codegen_server( cinp_server, monkeypatch ):
+  monkeypatch.setenv( 'SOURCE_DATE_EPOCH', '1600000000' )  # the same generated at timestamp as the renders to compare with
+  codegen = CodegenService( cache_size=2, render_jobs=1, allowed_endpoint_list=[ cinp_server.endpoint ] )
+  server = CodegenServer( ( '127.0.0.1', 0 ), codegen )
+  thread = threading.Thread( target=server.serve_forever, daemon=True )
+  thread.start()
+  try:
+    yield server
+
+  finally:
+    server.shutdown()
+    server.server_close()
+    thread.join()
+    codegen.close()
+
+
+def _get( server, path, **query_map ):
+  connection = http.client.HTTPConnection( '127.0.0.1', server.server_address[1], timeout=60 )
+  try:
+    connection.request( 'GET', '{0}?{1}'.format( path, urllib.parse.urlencode( query_map, doseq=True ) ) )
+    response = connection.getresponse()
+    return response, response.read()
+
+  finally:
+    connection.close()
+
+
+def _read_tar( data ):
+  result = {}
+  with tarfile.open( fileobj=io.BytesIO( data ), mode='r:gz' ) as tar:
+    for member in tar.getmembers():
+      if member.isfile():
+        result[ member.name ] = tar.extractfile( member ).read()
+
+  return result
+
+
+def test_generate( cinp_server, codegen_server, tmp_path, read_output ):
+  response, body = _get( codegen_server, '/generate', endpoint=cinp_server.endpoint, service='test', language=[ 'go', 'rst' ] )
+  assert response.status == 200
+  assert response.getheader( 'X-API-Version' ) == '1.0'
+  assert response.getheader( 'X-Cache' ) == 'miss'
+
+  render( crawl( cinp_server.endpoint ), [ 'go', 'rst' ], str( tmp_path ), 'test' )
+  assert _read_tar( body ) == dict( [ ( 'test/{0}'.format( name ), content ) for name, content in read_output( str( tmp_path ) ).items() ] )
+
+  describe_count = len( cinp_server.describe_list )
+  response, cached_body = _get( codegen_server, '/generate', endpoint=cinp_server.endpoint, service='test', language='go,rst' )
+  assert response.status == 200
+  assert response.getheader( 'X-Cache' ) == 'hit'
+  assert cached_body == body
+  assert len( cinp_server.describe_list ) == describe_count + 1  # only the root, for the api-version
+
+  cinp_server.set_api_version( '2.0' )
+  response, _ = _get( codegen_server, '/generate', endpoint=cinp_server.endpoint, service='test', language='go,rst' )
+  assert response.getheader( 'X-API-Version' ) == '2.0'
+  assert response.getheader( 'X-Cache' ) == 'miss'
+
+  response, body = _get( codegen_server, '/stats' )
+  stats = json.loads( body )
+  assert stats[ 'output_cache' ][ 'hits' ] == 1
+  assert stats[ 'output_cache' ][ 'size' ] == 2
+  assert codegen_server.codegen.key_lock_map == {}
+
+
+def test_rejected( cinp_server, codegen_server ):
+  response, body = _get( codegen_server, '/generate', endpoint='http://127.0.0.2/api/v1/', service='test' )
+  assert response.status == 400
+  assert json.loads( body )[ 'message' ] == 'Endpoint "http://127.0.0.2/api/v1/" is not allowed'
+
+  assert _get( codegen_server, '/generate', endpoint='file:///etc/', service='test' )[0].status == 400
+  assert _get( codegen_server, '/generate', endpoint=cinp_server.endpoint, service='not valid' )[0].status == 400
+  assert _get( codegen_server, '/generate', endpoint=cinp_server.endpoint, service='test', language='cobol' )[0].status == 400
+  assert _get( codegen_server, '/generate', service='test' )[0].status == 400
+  assert _get( codegen_server, '/other' )[0].status == 404
+  assert cinp_server.describe_list == []
+
+
+def test_key_lock( cinp_server, codegen_server ):
+  codegen = codegen_server.codegen
+  result_list = []
+
+  def _generate():
+    result_list.append( codegen.get_output( cinp_server.endpoint, 'test', 'rst' ) )
+
+  thread_list = [ threading.Thread( target=_generate ) for _ in range( 4 ) ]
+  for thread in thread_list:
+    thread.start()
+
+  for thread in thread_list:
+    thread.join()
+
+  assert len( set( [ output for _, output, _ in result_list ] ) ) == 1
+  assert [ cached for _, _, cached in result_list ].count( False ) == 1  # the others waited for the first
+  assert codegen.key_lock_map == {}
@@ -0,0 +1,46 @@
+"""
+Hashes of the generator's source, for keying what is cached from its
+output.  Kept apart from templates so the caches and --check do not import
+jinja2.
+"""
+import os
+import hashlib
+import functools
+
+
+def module_hash( module_filename ):
+  """
+  Returns the hash of the source of the module in module_filename, for keying
+  what is cached from its output.
+  """
+  with open( module_filename, 'rb' ) as fp:
+    return hashlib.sha1( fp.read() ).hexdigest()[ :16 ]
+
+
+def backend_filename( language ):
+  """
+  Returns the filename of the backend module of language, which has its
+  templates and filters.
+  """
+  return os.path.join( os.path.dirname( os.path.abspath( __file__ ) ), 'codegen_{0}.py'.format( language ) )
+
+
+@functools.lru_cache( maxsize=None )
+def generator_hash():
+  """
+  Returns the hash of the source of the modules shared by the backends, all
+  of cinp_utils but the backends (see backend_filename) and the tests, for
+  keying what is cached from the output along with the module_hash of the
+  backend.
+  """
+  hasher = hashlib.sha1()
+  module_dir = os.path.dirname( os.path.abspath( __file__ ) )
+  for name in sorted( os.listdir( module_dir ) ):
+    if not name.endswith( '.py' ) or name.endswith( '_test.py' ) or name.startswith( 'codegen_' ):
+      continue
+
+    with open( os.path.join( module_dir, name ), 'rb' ) as fp:
+      hasher.update( '{0}\0'.format( name ).encode( 'utf-8' ) )
+      hasher.update( fp.read() )
+
+  return hasher.hexdigest()[ :16 ]
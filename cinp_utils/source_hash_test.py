@@ -0,0 +1,23 @@
+import os
+
+from cinp_utils.source_hash import module_hash, backend_filename, generator_hash
+
+
+def test_module_hash( tmp_path ):
+  filename = str( tmp_path / 'module.py' )
+  with open( filename, 'w' ) as fp:
+    fp.write( 'a = 1\n' )
+
+  first = module_hash( filename )
+  assert first == module_hash( filename )
+
+  with open( filename, 'w' ) as fp:
+    fp.write( 'a = 2\n' )
+
+  assert module_hash( filename ) != first
+  assert os.path.exists( backend_filename( 'rust' ) )
+
+
+def test_generator_hash():
+  assert generator_hash() == generator_hash()
+  assert len( generator_hash() ) == 16
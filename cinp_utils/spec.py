@@ -0,0 +1,101 @@
+"""
+A spec snapshot is a gzipped JSON lines file.  The first line is the header,
+( version, url, root_path and the timestamp of the crawl ), followed by one
+line per Namespace in depth first order, each with the index of its parent
+Namespace and the Namespace without its namespace_list.  This lets a
+snapshot be read one Namespace at a time without holding all of it in memory.
+"""
+
+import os
+import copy
+import gzip
+import json
+from itertools import count
+
+from cinp_utils.records import Namespace, as_dict
+
+SPEC_VERSION = 1
+
+
+def iter_tree( root ):
+  """
+  The reverse of build_tree, yields ( parent index, namespace ) in depth
+  first order, each namespace is a copy with an empty namespace_list.
+  """
+  counter = count()
+  stack = [ ( root, None ) ]
+  while stack:
+    namespace, parent = stack.pop()
+    index = next( counter )
+    entry = copy.copy( namespace )
+    entry[ 'namespace_list' ] = []
+    yield parent, entry
+    stack += [ ( child, index ) for child in reversed( namespace[ 'namespace_list' ] ) ]
+
+
+def save_spec( filename, spec ):
+  tmp_filename = '{0}.tmp'.format( filename )
+  with gzip.open( tmp_filename, 'wt', encoding='utf-8' ) as fp:
+    fp.write( json.dumps( { 'version': SPEC_VERSION, 'url': spec[ 'url' ], 'root_path': spec[ 'root_path' ], 'timestamp': spec[ 'timestamp' ] }, separators=( ',', ':' ) ) )
+    fp.write( '\n' )
+    for parent, namespace in iter_tree( spec[ 'root' ] ):
+      del namespace[ 'namespace_list' ]
+      fp.write( json.dumps( { 'parent': parent, 'namespace': namespace }, separators=( ',', ':' ), default=as_dict ) )
+      fp.write( '\n' )
+
+  os.replace( tmp_filename, filename )
+
+
+def iter_spec( filename ):
+  """
+  returns the header of the snapshot and a generator of ( parent index, namespace )
+  in depth first order, the namespace_list of each namespace is empty
+  """
+  fp = gzip.open( filename, 'rt', encoding='utf-8' )
+  try:
+    header = json.loads( fp.readline() )
+  except ValueError:
+    fp.close()
+    raise ValueError( 'Spec "{0}" has an invalid header'.format( filename ) )
+
+  if header.get( 'version' ) != SPEC_VERSION:
+    fp.close()
+    raise ValueError( 'Spec "{0}" is version "{1}", expected "{2}"'.format( filename, header.get( 'version' ), SPEC_VERSION ) )
+
+  def _namespaces():
+    with fp:
+      for line in fp:
+        entry = json.loads( line )
+        namespace = Namespace( entry[ 'namespace' ] )
+        namespace[ 'namespace_list' ] = []
+        yield entry[ 'parent' ], namespace
+
+  return header, _namespaces()
+
+
+def build_tree( namespace_iter ):
+  """
+  Assemble ( parent index, namespace ) pairs as produced by iter_spec and
+  Crawler.walk into the tree, returns the root or None if there are none.
+  """
+  namespace_list = []
+  for parent, namespace in namespace_iter:
+    if parent is not None:
+      namespace_list[ parent ][ 'namespace_list' ].append( namespace )
+
+    namespace_list.append( namespace )
+
+  if not namespace_list:
+    return None
+
+  return namespace_list[0]
+
+
+def load_spec( filename ):
+  header, namespace_iter = iter_spec( filename )
+
+  root = build_tree( namespace_iter )
+  if root is None:
+    raise ValueError( 'Spec "{0}" has no root Namespace'.format( filename ) )
+
+  return { 'url': header[ 'url' ], 'root_path': header[ 'root_path' ], 'timestamp': header[ 'timestamp' ], 'root': root }
@@ -0,0 +1,35 @@
+import gzip
+import json
+
+import pytest
+
+from cinp_utils.spec import save_spec, load_spec, iter_spec, iter_tree, build_tree
+from cinp_utils.codegen import crawl, render
+
+
+def test_snapshot( cinp_server, tmp_path, read_output ):
+  spec = crawl( cinp_server.endpoint )
+  filename = str( tmp_path / 'api.spec' )
+  save_spec( filename, spec )
+
+  loaded_spec = load_spec( filename )
+  assert loaded_spec == spec
+
+  header, namespace_iter = iter_spec( filename )
+  assert header[ 'url' ] == cinp_server.endpoint
+  assert [ namespace[ 'name' ] for _, namespace in namespace_iter ] == [ 'root', 'Auth' ]
+  assert build_tree( iter_tree( spec[ 'root' ] ) ) == spec[ 'root' ]
+
+  render( spec, 'go', str( tmp_path / 'crawled' ), 'test', timestamp='spec' )
+  render( loaded_spec, 'go', str( tmp_path / 'loaded' ), 'test', timestamp='spec' )
+  assert read_output( str( tmp_path / 'loaded' ) ) == read_output( str( tmp_path / 'crawled' ) )
+
+
+def test_version( tmp_path ):
+  filename = str( tmp_path / 'api.spec' )
+  with gzip.open( filename, 'wt' ) as fp:
+    fp.write( json.dumps( { 'version': 0, 'url': 'http://test/api/v1/', 'root_path': '/api/v1/', 'timestamp': '' } ) )
+    fp.write( '\n' )
+
+  with pytest.raises( ValueError ):
+    load_spec( filename )
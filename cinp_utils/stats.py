@@ -0,0 +1,96 @@
+import time
+import threading
+
+BUCKET_LIST = ( 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0 )
+OUTCOME_LIST = ( 'ok', 'cached', 'resumed', 'retried', 'not_authorized', 'wrong_type', 'error' )
+
+
+class CrawlStats():
+  """
+  Collects the latency, bytes received and outcome of every describe made
+  by the Crawler, and the time spent crawling and rendering.  record is
+  called from the crawl worker threads.
+  """
+  def __init__( self ):
+    super().__init__()
+    self.lock = threading.Lock()
+    self.record_list = []
+    self.phase_map = {}
+
+  def record( self, kind, url, elapsed, size, outcome ):
+    with self.lock:
+      self.record_list.append( ( kind, url, elapsed, size, outcome ) )
+
+  def add_time( self, phase, elapsed ):
+    self.phase_map[ phase ] = self.phase_map.get( phase, 0.0 ) + elapsed
+
+  def timed_iter( self, iterable, phase ):
+    """
+    Wrap iterable, the time spent getting each item is added to phase, so
+    the crawl time can be split out of a streaming render.
+    """
+    iterator = iter( iterable )
+    while True:
+      start = time.perf_counter()
+      try:
+        item = next( iterator )
+      except StopIteration:
+        return
+      finally:
+        self.add_time( phase, time.perf_counter() - start )
+
+      yield item
+
+  def report( self, slowest_count=10 ):
+    kind_map = {}
+    with self.lock:
+      record_list = list( self.record_list )
+
+    for kind, url, elapsed, size, outcome in record_list:
+      try:
+        entry = kind_map[ kind ]
+      except KeyError:
+        entry = { 'count': 0, 'total_time': 0.0, 'max_time': 0.0, 'bytes': 0, 'outcome_map': dict( [ ( i, 0 ) for i in OUTCOME_LIST ] ), 'histogram': [ 0 ] * ( len( BUCKET_LIST ) + 1 ) }
+        kind_map[ kind ] = entry
+
+      entry[ 'count' ] += 1
+      entry[ 'total_time' ] += elapsed
+      entry[ 'max_time' ] = max( entry[ 'max_time' ], elapsed )
+      entry[ 'bytes' ] += size
+      entry[ 'outcome_map' ][ outcome ] += 1
+      for index, bucket in enumerate( BUCKET_LIST ):
+        if elapsed <= bucket:
+          break
+      else:
+        index = len( BUCKET_LIST )
+
+      entry[ 'histogram' ][ index ] += 1
+
+    slowest_list = sorted( record_list, key=lambda i: i[2], reverse=True )[ :slowest_count ]
+
+    return {
+             'phase_map': self.phase_map,
+             'bucket_list': list( BUCKET_LIST ),
+             'kind_map': kind_map,
+             'slowest_list': [ { 'kind': kind, 'url': url, 'time': elapsed, 'bytes': size, 'outcome': outcome } for kind, url, elapsed, size, outcome in slowest_list ]
+           }
+
+
+def format_report( report ):
+  result = 'Crawl Report\n'
+  result += '  ' + '  '.join( [ '{0}: {1:.3f}s'.format( name, value ) for name, value in sorted( report[ 'phase_map' ].items() ) ] ) + '\n'
+
+  bucket_name_list = [ '<={0}s'.format( i ) for i in report[ 'bucket_list' ] ] + [ '>{0}s'.format( report[ 'bucket_list' ][ -1 ] ) ]
+  for kind, entry in sorted( report[ 'kind_map' ].items() ):
+    result += '\n{0}: {1} describes, {2:.3f}s total, {3:.3f}s max, {4} bytes received\n'.format( kind, entry[ 'count' ], entry[ 'total_time' ], entry[ 'max_time' ], entry[ 'bytes' ] )
+    result += '  ' + ', '.join( [ '{0}: {1}'.format( name, value ) for name, value in entry[ 'outcome_map' ].items() if value ] ) + '\n'
+    for name, value in zip( bucket_name_list, entry[ 'histogram' ] ):
+      if value:
+        result += '  {0:>8} {1:6d}\n'.format( name, value )
+
+  if report[ 'slowest_list' ]:
+    result += '\nSlowest:\n'
+    for item in report[ 'slowest_list' ]:
+      result += '  {0:.3f}s {1:>9} {2:>14} {3}\n'.format( item[ 'time' ], item[ 'kind' ], item[ 'outcome' ], item[ 'url' ] )
+
+  return result
@@ -0,0 +1,51 @@
+from cinp_utils import crawler
+from cinp_utils.stats import CrawlStats, format_report
+from cinp_utils.codegen import crawl
+
+
+def test_crawl_stats( cinp_server, tmp_path, monkeypatch ):
+  monkeypatch.setattr( crawler, 'RETRY_DELAY', 0.01 )
+  cinp_server.delay_map[ '/api/v1/Auth/User' ] = 0.1
+  cinp_server.fail_map[ '/api/v1/Auth/Group' ] = 1
+  stats = CrawlStats()
+  crawl( cinp_server.endpoint, stats=stats, retries=1 )
+
+  report = stats.report( slowest_count=1 )
+  assert sorted( report[ 'kind_map' ] ) == [ 'Action', 'Model', 'Namespace' ]
+  assert report[ 'kind_map' ][ 'Namespace' ][ 'count' ] == 2
+  assert report[ 'kind_map' ][ 'Model' ][ 'outcome_map' ][ 'ok' ] == 3
+  assert report[ 'kind_map' ][ 'Model' ][ 'outcome_map' ][ 'retried' ] == 1
+  assert report[ 'kind_map' ][ 'Action' ][ 'bytes' ] > 0
+  assert report[ 'slowest_list' ][0][ 'url' ] == '/api/v1/Auth/User'
+  assert '/api/v1/Auth/User' in format_report( report )
+
+  stats = CrawlStats()
+  crawl( cinp_server.endpoint, stats=stats, cache_dir=str( tmp_path ) )
+  stats = CrawlStats()
+  crawl( cinp_server.endpoint, stats=stats, cache_dir=str( tmp_path ) )
+  report = stats.report()
+  assert report[ 'kind_map' ][ 'Model' ][ 'outcome_map' ][ 'cached' ] == 3
+  assert report[ 'kind_map' ][ 'Model' ][ 'bytes' ] == 0  # nothing was received
+  assert report[ 'kind_map' ][ 'Namespace' ][ 'outcome_map' ][ 'ok' ] == 2
+
+
+def test_bytes_received( cinp_server ):
+  """
+  With the gzipped transport the bytes are the bodies as sent, not their
+  size decoded.
+  """
+  stats = CrawlStats()
+  crawl( cinp_server.endpoint, stats=stats, keep_alive=True, jobs=4 )
+  report = stats.report()
+  assert sum( [ entry[ 'bytes' ] for entry in report[ 'kind_map' ].values() ] ) == cinp_server.byte_count
+  assert 'bytes received' in format_report( report )
+
+  plain_stats = CrawlStats()
+  crawl( cinp_server.endpoint, stats=plain_stats )
+  assert report[ 'kind_map' ][ 'Model' ][ 'bytes' ] < plain_stats.report()[ 'kind_map' ][ 'Model' ][ 'bytes' ]
+
+
+def test_timed_iter():
+  stats = CrawlStats()
+  assert list( stats.timed_iter( range( 3 ), 'crawl' ) ) == [ 0, 1, 2 ]
+  assert stats.report()[ 'phase_map' ][ 'crawl' ] >= 0.0
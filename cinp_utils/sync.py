@@ -0,0 +1,118 @@
+import os
+import re
+import hashlib
+from contextlib import contextmanager
+
+GENERATED_MARKER = b'Automatically generated by cinp-codegen'
+HEADER_TIMESTAMP_RE = re.compile( rb'(' + GENERATED_MARKER + rb' from \S+) at \d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}(\.\d+)?' )  # the header check.URL_PATTERN parses, see codegen.get_header_map
+MARKER_HEAD_SIZE = 1024
+CHUNK_SIZE = 65536
+
+
+def _strip_timestamp( data ):
+  return HEADER_TIMESTAMP_RE.sub( rb'\1', data, count=1 )  # only the generated at timestamp, other datetimes are content
+
+
+def _is_generated( filename ):
+  with open( filename, 'rb' ) as fp:
+    return GENERATED_MARKER in fp.read( MARKER_HEAD_SIZE )
+
+
+def _file_hash( filename ):
+  hash = hashlib.sha256()
+  with open( filename, 'rb' ) as fp:
+    for chunk in iter( lambda: fp.read( CHUNK_SIZE ), b'' ):
+      hash.update( chunk )
+
+  return hash.digest()
+
+
+def _same_content( filename, other_filename ):
+  try:
+    if os.path.getsize( filename ) != os.path.getsize( other_filename ):
+      return False
+
+  except FileNotFoundError:
+    return False
+
+  return _file_hash( filename ) == _file_hash( other_filename )
+
+
+@contextmanager
+def output_file( filename ):
+  """
+  Open filename to write generated output to.  The output is written to a
+  temp file that then replaces filename, so filename is never partly
+  written.  If the content is the same as filename's, filename is not
+  touched, so its mtime does not change and the builds that depend on it
+  have nothing to redo.
+  """
+  tmp_filename = '{0}.tmp'.format( filename )
+  try:
+    with open( tmp_filename, 'w' ) as fp:
+      yield fp
+
+    if _same_content( tmp_filename, filename ):
+      os.unlink( tmp_filename )
+    else:
+      os.replace( tmp_filename, filename )
+
+  except BaseException:
+    try:
+      os.unlink( tmp_filename )
+    except FileNotFoundError:
+      pass
+
+    raise
+
+
+def sync_dir( src_dir, dst_dir ):
+  """
+  Make the generated output in dst_dir match src_dir, only files whose
+  content changed, other than the generated at timestamp, are written.
+  Generated files in dst_dir that are no longer in src_dir are removed,
+  other files and directories src_dir does not have are left alone.
+  Returns ( written list, removed list ) of paths relative to dst_dir.
+  """
+  written_list = []
+  removed_list = []
+  src_name_set = set()
+  src_dir_set = set()
+  for dirpath, _, filename_list in os.walk( src_dir ):
+    relative_dir = os.path.relpath( dirpath, src_dir )
+    src_dir_set.add( os.path.normpath( relative_dir ) )
+    for filename in filename_list:
+      name = os.path.normpath( os.path.join( relative_dir, filename ) )
+      src_name_set.add( name )
+      with open( os.path.join( src_dir, name ), 'rb' ) as fp:
+        data = fp.read()
+
+      target = os.path.join( dst_dir, name )
+      try:
+        with open( target, 'rb' ) as fp:
+          if _strip_timestamp( fp.read() ) == _strip_timestamp( data ):
+            continue
+
+      except FileNotFoundError:
+        pass
+
+      os.makedirs( os.path.dirname( target ), exist_ok=True )
+      tmp_target = '{0}.tmp'.format( target )
+      with open( tmp_target, 'wb' ) as fp:
+        fp.write( data )
+
+      os.replace( tmp_target, target )
+      written_list.append( name )
+
+  for dirpath, _, filename_list in os.walk( dst_dir ):
+    relative_dir = os.path.normpath( os.path.relpath( dirpath, dst_dir ) )
+    if relative_dir not in src_dir_set:
+      continue
+
+    for filename in filename_list:
+      name = os.path.normpath( os.path.join( relative_dir, filename ) )
+      if name not in src_name_set and _is_generated( os.path.join( dst_dir, name ) ):
+        os.unlink( os.path.join( dst_dir, name ) )
+        removed_list.append( name )
+
+  return sorted( written_list ), sorted( removed_list )
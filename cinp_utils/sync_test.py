@@ -0,0 +1,75 @@
+import os
+import time
+
+import pytest
+
+from cinp_utils.sync import sync_dir, output_file
+from cinp_utils.codegen import regenerate
+
+HEADER = '// Automatically generated by cinp-codegen from http://test/api/v1/ at {0}\n'
+
+
+def _write( filename, content ):
+  os.makedirs( os.path.dirname( filename ), exist_ok=True )
+  with open( filename, 'w' ) as fp:
+    fp.write( content )
+
+
+def test_sync_dir( tmp_path ):
+  src_dir = str( tmp_path / 'src' )
+  dst_dir = str( tmp_path / 'dst' )
+  _write( os.path.join( src_dir, 'a.go' ), HEADER.format( '2020-01-01T00:00:00.000001' ) + 'const when = "2020-01-01T00:00:00"\n' )
+  _write( os.path.join( src_dir, 'sub', 'b.go' ), HEADER.format( '2020-01-01T00:00:00.000001' ) )
+
+  assert sync_dir( src_dir, dst_dir ) == ( [ 'a.go', 'sub/b.go' ], [] )
+  assert sync_dir( src_dir, dst_dir ) == ( [], [] )
+
+  _write( os.path.join( src_dir, 'sub', 'b.go' ), HEADER.format( '2021-06-01T12:30:00' ) )
+  assert sync_dir( src_dir, dst_dir ) == ( [], [] )  # only the generated at timestamp changed
+  with open( os.path.join( dst_dir, 'sub', 'b.go' ), 'r' ) as fp:
+    assert '2020-01-01T00:00:00.000001' in fp.read()
+
+  _write( os.path.join( src_dir, 'a.go' ), HEADER.format( '2020-01-01T00:00:00.000001' ) + 'const when = "2021-06-01T12:30:00"\n' )
+  assert sync_dir( src_dir, dst_dir ) == ( [ 'a.go' ], [] )  # other datetimes are content
+
+  _write( os.path.join( dst_dir, 'sub', 'c.go' ), HEADER.format( '2020-01-01T00:00:00' ) )
+  _write( os.path.join( dst_dir, 'sub', 'notes.txt' ), 'not generated\n' )
+  assert sync_dir( src_dir, dst_dir ) == ( [], [ 'sub/c.go' ] )
+  assert os.path.exists( os.path.join( dst_dir, 'sub', 'notes.txt' ) )
+
+
+def test_regenerate( cinp_server, tmp_path ):
+  wrk_dir = str( tmp_path )
+  created = cinp_server.tree[ '/api/v1/Auth/User' ][1][ 'fields' ][2]
+  created[ 'default' ] = '2020-01-01T00:00:00'
+  assert regenerate( cinp_server.endpoint, 'test', 'rst', wrk_dir ) == ( [ 'api.rst' ], [] )
+
+  assert regenerate( cinp_server.endpoint, 'test', 'rst', wrk_dir ) == ( [], [] )  # only the generated at timestamp is later
+
+  created[ 'default' ] = '2021-06-01T12:30:00'
+  assert regenerate( cinp_server.endpoint, 'test', 'rst', wrk_dir ) == ( [ 'api.rst' ], [] )
+  with open( os.path.join( wrk_dir, 'api.rst' ), 'r' ) as fp:
+    assert '2021-06-01T12:30:00' in fp.read()
+
+
+def test_output_file( tmp_path ):
+  filename = str( tmp_path / 'a.go' )
+  with output_file( filename ) as fp:
+    fp.write( 'first\n' )
+
+  mtime = os.stat( filename ).st_mtime_ns
+  time.sleep( 0.01 )
+  with output_file( filename ) as fp:
+    fp.write( 'first\n' )
+
+  assert os.stat( filename ).st_mtime_ns == mtime  # the same content is not written
+
+  with pytest.raises( ValueError ):
+    with output_file( filename ) as fp:
+      fp.write( 'second\n' )
+      raise ValueError( 'render failed' )
+
+  with open( filename, 'r' ) as fp:
+    assert fp.read() == 'first\n'  # never partly written
+
+  assert os.listdir( str( tmp_path ) ) == [ 'a.go' ]
@@ -0,0 +1,33 @@
+import os
+from jinja2 import Environment, DictLoader, FileSystemBytecodeCache
+
+from cinp_utils.source_hash import module_hash
+
+CACHE_DIR_ENV = 'CINP_CODEGEN_TEMPLATE_CACHE'
+
+
+def get_environment( name, module_filename, template_map, **kwargs ):
+  """
+  Returns the jinja Environment for the templates of a backend, they are
+  compiled from template_map when first used.  The compiled templates are
+  cached in the directory from $CINP_CODEGEN_TEMPLATE_CACHE, or a per user
+  temp directory, so later runs skip compiling them.  Cache entries are
+  keyed on the source of the backend module, module_filename, as how the
+  filters are called is compiled in to the templates.  kwargs are passed to
+  the Environment.
+  """
+  cache_dir = os.environ.get( CACHE_DIR_ENV, None )
+  if cache_dir:
+    os.makedirs( cache_dir, exist_ok=True )
+
+  bytecode_cache = FileSystemBytecodeCache( cache_dir or None, 'cinp-codegen-{0}-{1}-%s.cache'.format( name, module_hash( module_filename ) ) )
+
+  return Environment( loader=DictLoader( template_map ), bytecode_cache=bytecode_cache, auto_reload=False, **kwargs )
+
+
+def load_templates( env ):
+  """
+  Compile (or load from the cache) all the templates of env.
+  """
+  for name in env.list_templates():
+    env.get_template( name )
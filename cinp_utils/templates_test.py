@@ -0,0 +1,23 @@
+import os
+
+from cinp_utils.templates import CACHE_DIR_ENV, get_environment, load_templates
+from cinp_utils.source_hash import module_hash, backend_filename
+
+
+def test_bytecode_cache( tmp_path, monkeypatch ):
+  cache_dir = str( tmp_path / 'cache' )
+  monkeypatch.setenv( CACHE_DIR_ENV, cache_dir )
+  template_map = { 'model': 'Model {{ name }}' }
+
+  env = get_environment( 'test', __file__, template_map )
+  load_templates( env )
+  filename_list = os.listdir( cache_dir )
+  assert len( filename_list ) == 1
+  assert filename_list[0].startswith( 'cinp-codegen-test-{0}-'.format( module_hash( __file__ ) ) )
+
+  env = get_environment( 'test', __file__, template_map )  # from the cache
+  assert env.get_template( 'model' ).render( name='User' ) == 'Model User'
+  assert os.listdir( cache_dir ) == filename_list
+
+  load_templates( get_environment( 'test', backend_filename( 'go' ), template_map ) )  # keyed on the module source
+  assert len( os.listdir( cache_dir ) ) == 2
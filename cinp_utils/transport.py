@@ -0,0 +1,175 @@
+import ssl
+import gzip
+import json
+import socket
+import logging
+import threading
+import http.client
+import urllib.parse
+
+from cinp import client
+
+CINP_VERSION = '1.0'
+USER_AGENT = 'cinp-codegen'
+TCP_QUICKACK = getattr( socket, 'TCP_QUICKACK', None )  # linux only
+
+
+class DescribeTransport():
+  """
+  Makes DESCRIBE requests, the only request the crawl needs, over persistent
+  HTTP/1.1 connections and asks for gzipped responses.  Connections are kept
+  open in an idle pool once a request is done and reused by the next request
+  from any thread, so a crawl with N workers holds at most N connections open
+  for the whole crawl instead of connecting for every describe, and crawls of
+  services on the same host can share one transport and its connections.
+
+  describe matches client.CInP.describe, so it can be used in place of it,
+  its timeout, or the timeout of the transport, applies to each request on
+  new and reused connections.
+  """
+  def __init__( self, host, proxy=None, verify_ssl=True, timeout=30 ):
+    super().__init__()
+    url = urllib.parse.urlparse( host )
+    if url.scheme not in ( 'http', 'https' ):
+      raise ValueError( 'hostname must start with http(s):' )
+
+    self.host = host
+    self.scheme = url.scheme
+    self.hostname = url.hostname
+    self.port = url.port
+    self.proxy = urllib.parse.urlparse( proxy ) if proxy else None
+    self.timeout = timeout
+    self.ssl_context = ssl.create_default_context() if verify_ssl else ssl._create_unverified_context()
+    self._lock = threading.Lock()
+    self._idle_list = []
+    self._local = threading.local()
+
+  def _connect( self ):
+    if self.proxy is not None:
+      hostname, port = self.proxy.hostname, self.proxy.port
+    else:
+      hostname, port = self.hostname, self.port
+
+    if self.scheme == 'https':
+      connection = http.client.HTTPSConnection( hostname, port, timeout=self.timeout, context=self.ssl_context )
+      if self.proxy is not None:
+        connection.set_tunnel( self.hostname, self.port )
+
+    else:
+      connection = http.client.HTTPConnection( hostname, port, timeout=self.timeout )
+
+    return connection
+
+  def _checkout( self ):
+    with self._lock:
+      if self._idle_list:
+        return self._idle_list.pop(), True
+
+    return self._connect(), False
+
+  def _checkin( self, connection ):
+    with self._lock:
+      self._idle_list.append( connection )
+
+  def close( self ):
+    with self._lock:
+      idle_list = self._idle_list
+      self._idle_list = []
+
+    for connection in idle_list:
+      connection.close()
+
+  def _request( self, uri, timeout ):
+    if self.proxy is not None and self.scheme == 'http':
+      target = '{0}{1}'.format( self.host, uri )
+    else:
+      target = uri
+
+    header_map = {
+                   'User-Agent': USER_AGENT,
+                   'Accept': 'application/json',
+                   'Accept-Charset': 'utf-8',
+                   'Accept-Encoding': 'gzip',
+                   'Content-Type': 'application/json;charset=utf-8',
+                   'CInP-Version': CINP_VERSION
+                 }
+
+    connection, reused = self._checkout()
+    connection.timeout = timeout  # used when connecting
+    if connection.sock is not None:
+      connection.sock.settimeout( timeout )
+
+    try:
+      if connection.sock is None:
+        connection.connect()
+        connection.sock.setsockopt( socket.IPPROTO_TCP, socket.TCP_NODELAY, 1 )
+
+      connection.request( 'DESCRIBE', target, headers=header_map )
+      if TCP_QUICKACK is not None:
+        # a server that writes the headers and the body separately holds the
+        # body (Nagle) until the headers are ACKed, and on a reused connection
+        # the ACK is delayed ~40ms, for every request
+        connection.sock.setsockopt( socket.IPPROTO_TCP, TCP_QUICKACK, 1 )
+
+      response = connection.getresponse()
+      body = response.read()
+
+    except ( http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError ):
+      connection.close()
+      if not reused:
+        raise
+
+      logging.debug( 'cinp-codegen: connection to "{0}" was closed, reconnecting'.format( self.host ) )
+      return self._request( uri, timeout )  # the server closed the idle connection, DESCRIBE is safe to repeat
+
+    except socket.timeout:
+      connection.close()
+      raise client.Timeout( 'Request Timeout after {0} seconds'.format( timeout ) )
+
+    except Exception:
+      connection.close()
+      raise
+
+    if response.will_close:
+      connection.close()
+    else:
+      self._checkin( connection )
+
+    self._local.received_size = len( body )
+    if response.getheader( 'Content-Encoding', '' ).lower() == 'gzip':
+      body = gzip.decompress( body )
+
+    return response, body
+
+  def received_size( self ):
+    """
+    Returns the bytes of the body of the last response received by this
+    thread, as sent, before it is gunzipped.
+    """
+    return getattr( self._local, 'received_size', 0 )
+
+  def describe( self, uri, timeout=None ):
+    logging.debug( 'cinp-codegen: DESCRIBE "{0}"'.format( uri ) )
+    response, body = self._request( uri, self.timeout if timeout is None else timeout )
+
+    if response.status == 401:
+      raise client.InvalidSession()
+
+    if response.status == 403:
+      raise client.NotAuthorized()
+
+    if response.status == 404:
+      raise client.NotFound()
+
+    if response.status == 500:
+      raise client.ServerError( 'Server Error: "{0}"'.format( str( body[ 0:200 ], 'utf-8', 'replace' ) ) )
+
+    if response.status != 200:
+      raise client.ResponseError( 'Unexpected HTTP Code "{0}" for DESCRIBE'.format( response.status ) )
+
+    try:
+      data = json.loads( str( body, 'utf-8' ) )
+    except ValueError:
+      raise client.ResponseError( 'Unable to parse response "{0}"'.format( str( body[ 0:200 ], 'utf-8', 'replace' ) ) )
+
+    return data, response.getheader( 'Type' )
@@ -0,0 +1,201 @@
+"""
+Fixtures shared by the tests.  cinp_server is a stand-in CInP server, it
+answers DESCRIBE from a small tree (see build_tree) the tests can change
+while it runs, and records what was described.  read_output is read_dir, to
+compare rendered output.
+"""
+import os
+import copy
+import gzip
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+import pytest
+
+ROOT_PATH = '/api/v1/'
+
+
+def field( name, type, **kwargs ):
+  result = { 'name': name, 'type': type, 'mode': 'RW', 'required': True, 'is_array': False, 'default': None, 'doc': '' }
+  result.update( kwargs )
+  return result
+
+
+def model( name, path, field_list, **kwargs ):
+  """
+  kwargs are the other keys of the Model, with _ for -, ie: list_filters
+  """
+  result = {
+             'name': name,
+             'doc': '{0} doc'.format( name ),
+             'path': path,
+             'constants': {},
+             'fields': field_list,
+             'actions': [],
+             'not-allowed-verbs': [],
+             'list-filters': {},
+             'query-filter-fields': [],
+             'query-sort-fields': [],
+             'id-field-name': 'id'
+           }
+  result.update( dict( [ ( key.replace( '_', '-' ), value ) for key, value in kwargs.items() ] ) )
+  return result
+
+
+def build_tree( api_version='1.0' ):
+  """
+  Returns { path: ( type, item ) } of a root Namespace with a Model and an
+  Auth Namespace, the Models refer to each other in fields, list filters,
+  query filters and action paramaters.
+  """
+  auth = '{0}Auth/'.format( ROOT_PATH )
+  user = '{0}User'.format( auth )
+  group = '{0}Group'.format( auth )
+  item = '{0}Item'.format( ROOT_PATH )
+
+  return {
+           ROOT_PATH: ( 'Namespace', { 'name': 'root', 'doc': 'root doc', 'path': ROOT_PATH, 'api-version': api_version, 'multi-uri-max': 100, 'namespaces': [ auth ], 'models': [ item ] } ),
+           auth: ( 'Namespace', { 'name': 'Auth', 'doc': 'Auth doc', 'path': auth, 'api-version': api_version, 'multi-uri-max': 100, 'namespaces': [], 'models': [ user, group ] } ),
+           user: ( 'Model', model( 'User', user, [ field( 'id', 'Integer', mode='RO' ), field( 'username', 'String', length=40 ), field( 'created', 'DateTime', mode='RO' ),
+                                                   field( 'group', 'Model', uri=group ), field( 'tags', 'Model', uri=group, is_array=True, required=False ) ],
+                                   actions=[ '{0}(login)'.format( user ), '{0}(setGroup)'.format( user ) ],
+                                   list_filters={ 'group': [ field( 'group', 'Model', uri=group ) ] },
+                                   query_filter_fields=[ field( 'username', 'String' ), field( 'group', 'Model', uri=group ) ],
+                                   query_sort_fields=[ 'username' ] ) ),
+           '{0}(login)'.format( user ): ( 'Action', { 'name': 'login', 'doc': 'login doc', 'path': '{0}(login)'.format( user ), 'static': True,
+                                                      'return-type': field( None, 'String' ),
+                                                      'paramaters': [ field( 'username', 'String' ), field( 'password', 'String' ) ] } ),
+           '{0}(setGroup)'.format( user ): ( 'Action', { 'name': 'setGroup', 'doc': 'setGroup doc', 'path': '{0}(setGroup)'.format( user ), 'static': False,
+                                                         'return-type': { 'type': None },
+                                                         'paramaters': [ field( 'group', 'Model', uri=group ) ] } ),
+           group: ( 'Model', model( 'Group', group, [ field( 'id', 'Integer', mode='RO' ), field( 'name', 'String', length=40, default='users' ) ] ) ),
+           item: ( 'Model', model( 'Item', item, [ field( 'id', 'Integer', mode='RO' ), field( 'owner', 'Model', uri=user ), field( 'level', 'String', choices=[ 'low', 'high', None ] ) ],
+                                   not_allowed_verbs=[ 'DELETE' ], query_filter_fields=[ field( 'owner', 'Model', uri=user ) ] ) )
+         }
+
+
+class _Handler( BaseHTTPRequestHandler ):
+  protocol_version = 'HTTP/1.1'
+
+  def log_message( self, *args ):
+    pass
+
+  def setup( self ):
+    super().setup()
+    with self.server.lock:
+      self.server.connection_count += 1
+
+  def _send( self, status, body=b'', header_map=None ):
+    self.send_response( status )
+    for name, value in ( header_map or {} ).items():
+      self.send_header( name, value )
+
+    self.send_header( 'Content-Length', str( len( body ) ) )
+    self.end_headers()
+    self.wfile.write( body )
+    with self.server.lock:
+      self.server.byte_count += len( body )
+
+  def do_DESCRIBE( self ):
+    length = int( self.headers.get( 'Content-Length', 0 ) )
+    if length:
+      self.rfile.read( length )
+
+    server = self.server
+    with server.lock:
+      server.describe_list.append( self.path )
+      fail_count = server.fail_map.get( self.path, 0 )
+      if fail_count:
+        server.fail_map[ self.path ] = fail_count - 1
+
+      entry = copy.deepcopy( server.tree.get( self.path, None ) )
+      delay = server.delay_map.get( self.path, 0 )
+
+    time.sleep( delay )
+    if fail_count:
+      return self._send( 500, b'{"message": "stand-in failure"}' )
+
+    if entry is None:
+      return self._send( 404 )
+
+    type, item = entry
+    body = json.dumps( item ).encode( 'utf-8' )
+    header_map = { 'Type': type, 'Cinp-Version': '1.0', 'Content-Type': 'application/json;charset=utf-8' }
+    if 'gzip' in self.headers.get( 'Accept-Encoding', '' ):
+      body = gzip.compress( body )
+      header_map[ 'Content-Encoding' ] = 'gzip'
+
+    self._send( 200, body, header_map )
+
+
+class StandInServer( ThreadingMixIn, HTTPServer ):
+  """
+  tree is the { path: ( type, item ) } served, describe_list the paths
+  described, in order, fail_map { path: count } answers the next count
+  describes of path with a 500, delay_map { path: seconds } delays the
+  describes of path.  connection_count and byte_count are the connections
+  accepted and the bytes of the response bodies sent.
+  """
+  daemon_threads = True
+
+  def __init__( self ):
+    super().__init__( ( '127.0.0.1', 0 ), _Handler )
+    self.lock = threading.Lock()
+    self.tree = build_tree()
+    self.describe_list = []
+    self.fail_map = {}
+    self.delay_map = {}
+    self.connection_count = 0
+    self.byte_count = 0
+
+  def handle_error( self, request, client_address ):
+    pass  # ie: a client that timed out closed the connection before the response was sent
+
+  @property
+  def endpoint( self ):
+    return 'http://127.0.0.1:{0}{1}'.format( self.server_address[1], ROOT_PATH )
+
+  def set_api_version( self, api_version, path=None ):
+    """
+    Set the api-version of the Namespace at path, or all of them.
+    """
+    with self.lock:
+      for namespace_path, ( type, item ) in self.tree.items():
+        if type == 'Namespace' and path in ( None, namespace_path ):
+          item[ 'api-version' ] = api_version
+
+
+@pytest.fixture
+def cinp_server():
+  server = StandInServer()
+  thread = threading.Thread( target=server.serve_forever, daemon=True )
+  thread.start()
+  try:
+    yield server
+
+  finally:
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+def read_dir( path ):
+  """
+  Returns { filename relative to path: content } of the files under path.
+  """
+  result = {}
+  for dir_name, _, filename_list in os.walk( path ):
+    for filename in filename_list:
+      filename = os.path.join( dir_name, filename )
+      with open( filename, 'rb' ) as fp:
+        result[ os.path.relpath( filename, path ) ] = fp.read()
+
+  return result
+
+
+@pytest.fixture
+def read_output():
+  return read_dir